@@ -1,10 +1,16 @@
 #!/usr/bin/env python3
 
+import argparse
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
+
+from model_catalog import find_models, load_catalog
 
 def main():
+    parser = argparse.ArgumentParser(description="List the OpenAI models")
+    parser.add_argument("--refresh", action="store_true", help="ignore the cached model index")
+    args = parser.parse_args()
+
     load_dotenv()
 
     api_key = os.getenv("OPENAI_API_KEY")
@@ -12,20 +18,12 @@ def main():
         print("ERROR: OPENAI_API_KEY not found in environment")
         return
 
-    # Instantiate the client with the API key
-    client = OpenAI(api_key=api_key)
-
-    try:
-        # List available models using new API style
-        response = client.models.list()
-        models = response.data
-
-        print("Available OpenAI Models:")
-        for model in models:
-            print(f"- {model.id}")
+    # listed once and cached locally, together with the Gemini models - see model_catalog.py
+    catalog = load_catalog({"openai": api_key}, refresh=args.refresh)
 
-    except Exception as e:
-        print(f"Failed to retrieve models: {e}")
+    print("Available OpenAI Models:")
+    for model in find_models(catalog, provider="openai"):
+        print(f"- {model['name']}")
 
 if __name__ == "__main__":
     main()
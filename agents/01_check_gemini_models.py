@@ -1,10 +1,17 @@
 #!/usr/bin/env python3
+import argparse
 import os
 from dotenv import load_dotenv
-from google import genai
 from readable_number import ReadableNumber
 
+from model_catalog import find_models, load_catalog
+
 def main():
+    parser = argparse.ArgumentParser(description="List the Gemini models")
+    parser.add_argument("--refresh", action="store_true", help="ignore the cached model index")
+    parser.add_argument("--method", help="only models supporting this method, e.g. generateContent")
+    args = parser.parse_args()
+
     # Load environment variables from .env file
     load_dotenv()
 
@@ -13,20 +20,13 @@ def main():
         print("ERROR: GOOGLE_GENAI_API_KEY not found in environment")
         return
 
-    # Instantiate the Gemini API client with the API key
-    client = genai.Client(api_key=api_key)
     rn = ReadableNumber(precision=2, digit_group_size=3)
-    try:
-        # List available models
-        response = client.models.list(config={'page_size': 5})
-        while page:=response.next_page():
-            for model in page:
-                print(model.name,
-                     rn.of(model.input_token_limit),
-                      rn.of(model.output_token_limit))
-
-    except Exception as e:
-        print(f"Failed to retrieve models: {e}")
+    # all pages, fetched with the largest page size and cached locally - see model_catalog.py
+    catalog = load_catalog({"gemini": api_key}, refresh=args.refresh)
+    for model in find_models(catalog, provider="gemini", method=args.method):
+        print(model["name"],
+              rn.of(model["input_token_limit"]),
+              rn.of(model["output_token_limit"]))
 
 
 if __name__ == "__main__":
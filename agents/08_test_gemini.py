@@ -1,9 +1,13 @@
 #!/usr/bin/env python3
 # rate limits: https://ai.google.dev/gemini-api/docs/rate-limits#free-tier
 import os
+import sys
 from dotenv import load_dotenv
 from google import genai
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "ai_in_langgraph"))
+from rate_limiter import RateLimitedGenai, RateLimitScheduler
+
 def main():
     # Load environment variables, including your API key
     load_dotenv()
@@ -14,6 +18,8 @@ def main():
 
     # Instantiate the Gemini client (API key read automatically from GOOGLE_API_KEY or GEMINI_API_KEY)
     client = genai.Client(api_key=api_key)
+    # requests wait client-side for room in the model's RPM/TPM quota instead of bouncing off 429s
+    client = RateLimitedGenai(client, RateLimitScheduler())
 
     try:
         # Simple prompt request to generate content from the Gemini model
@@ -1,12 +1,18 @@
 #!/usr/bin/env python3
 
 # rate limits: https://ai.google.dev/gemini-api/docs/rate-limits#free-tier
+import argparse
+import json
 import os
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from dotenv import load_dotenv
 from openai import OpenAI
 
+from rate_limiter import RateLimitedOpenAI, RateLimitScheduler
+
 def hello_world(client):
     # response = client.models.generate_content(
     #     model="gemini-2.5-flash",
@@ -114,10 +120,106 @@ Answer: A bulldog weights 51 lbs
 """.strip()
 
 
+action_re = re.compile(r'^Action: (\w+): (.*)$')
+
+
+def query(client, question, max_turns=5, verbose=True):
+    """Run one question through the Thought/Action/Observation loop; returns the last reply and the turns taken."""
+    known_actions = get_known_actions()
+    bot = Agent(client, system=get_initial_prompt())
+    next_prompt = question
+    result = ""
+    for i in range(max_turns):
+        if verbose:
+            print("************************************")
+            print("next prompt:\n", next_prompt)
+        result = bot(next_prompt)
+        if verbose:
+            print("reply:\n", result)
+        actions = [
+            action_re.match(a) for a in result.split('\n') if action_re.match(a)
+        ]
+        if verbose:
+            print("actions: ", [a.groups() for a in actions])
+        if actions:
+            # There is an action to run
+            action, action_input = actions[0].groups()
+            if action not in known_actions:
+                raise Exception(f"Unknown action: {action}: {action_input}")
+            if verbose:
+                print(f" -- running {action} {action_input}")
+            observation = known_actions[action](action_input)
+            next_prompt = f"Observation: {observation}"
+        else:
+            return result, i + 1
+    return result, max_turns
+
+
+def answer_record(client, number, line, max_turns):
+    # one input line -> one output line; a failing question - or a malformed line - must not stop the batch
+    record = {"id": number}
+    started = time.perf_counter()
+    try:
+        item = json.loads(line)
+        if isinstance(item, str):
+            item = {"question": item}
+        if not isinstance(item, dict):
+            raise ValueError('expected {"id": ..., "question": "..."} or a string')
+        record["id"] = item.get("id", number)
+        if not isinstance(item.get("question"), str):
+            raise ValueError('no "question"')
+        record["question"] = item["question"]
+        reply, turns = query(client, item["question"], max_turns=max_turns, verbose=False)
+        record["turns"] = turns
+        if "Answer:" in reply:
+            record["answer"] = reply.split("Answer:", 1)[-1].strip()
+        else:
+            # out of turns (or the model stopped without an Answer): incomplete, not an answer
+            record["error"] = "max_turns" if turns >= max_turns else "no answer"
+            record["reply"] = reply
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["latency_s"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+def run_batch(client, in_path, out_path, concurrency=8, max_turns=5):
+    """Answer every question in a JSONL file ({"id": ..., "question": ...} or a bare string per line).
+
+    Each question gets its own Agent; up to `concurrency` of them talk to the
+    endpoint at once. Results are appended to out_path as they finish, so a
+    long run can be followed with tail -f and survives being interrupted. A
+    line that cannot be parsed or answered gets an {"id", "error"} record.
+    """
+    with open(in_path) as infile:
+        lines = [line for line in infile if line.strip()]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool, open(out_path, "a") as outfile:
+        futures = [pool.submit(answer_record, client, n, line, max_turns) for n, line in enumerate(lines)]
+        for done, future in enumerate(as_completed(futures), 1):
+            outfile.write(json.dumps(future.result()) + "\n")
+            outfile.flush()
+            if done % 50 == 0 or done == len(futures):
+                print(f"{done}/{len(futures)} answered in {time.perf_counter() - started:.1f}s")
+
+
 def main():
+    parser = argparse.ArgumentParser(description="ReAct agent from scratch")
+    parser.add_argument("--batch", help="JSONL file with questions to answer")
+    parser.add_argument("--out", default="answers.jsonl", help="JSONL file the batch answers are appended to")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--max-turns", type=int, default=5)
+    args = parser.parse_args()
+
     # Load environment variables, including your API key
     load_dotenv()
-    api_key = os.getenv("GOOGLE_GENAI_API_KEY")
+    # FAKE_PROVIDERS=1 replays a recorded transcript from a local stand-in, see fake_providers.py;
+    # imported only then, the agent itself needs nothing but the OpenAI client
+    fake = None
+    if os.getenv("FAKE_PROVIDERS"):
+        from fake_providers import fake_url
+        fake = fake_url()
+    api_key = "fake" if fake else os.getenv("GOOGLE_GENAI_API_KEY")
     if not api_key:
         print("ERROR: GOOGLE_GENAI_API_KEY not found in environment")
         return
@@ -126,40 +228,24 @@ def main():
     # https://ai.google.dev/gemini-api/docs/openai
     client = OpenAI(
         api_key  = api_key,
-        base_url = "https://generativelanguage.googleapis.com/v1beta/openai/"
+        base_url = f"{fake}/v1/" if fake else "https://generativelanguage.googleapis.com/v1beta/openai/",
+        max_retries = 5,  # batch runs are bound to hit the odd 429
     )
+    # queue requests client-side to stay within the per-model RPM/TPM quota
+    if not fake:
+        client = RateLimitedOpenAI(client, RateLimitScheduler())
 
     # manual_assistance(client)
 
-    known_actions = get_known_actions()
-    action_re = re.compile('^Action: (\w+): (.*)$')
-    bot = Agent(client, system=get_initial_prompt())
+    if args.batch:
+        run_batch(client, args.batch, args.out, concurrency=args.concurrency, max_turns=args.max_turns)
+        return
 
     next_prompt = """
         I have 2 dogs, a border collie and a scottish terrier. 
         What is their combined weight?
     """
-
-    for i in range(5):
-        print("************************************")
-        print("next prompt:\n", next_prompt)
-        result = bot(next_prompt)
-        print("reply:\n", result)
-        actions = [
-            action_re.match(a) for a in result.split('\n') if action_re.match(a)
-        ]
-        print("actions: ", [a.groups() for a in actions])
-        if actions:
-            # There is an action to run
-            action, action_input = actions[0].groups()
-            if action not in known_actions:
-                raise Exception(f"Unknown action: {action}: {action_input}")
-            print(f" -- running {action} {action_input}")
-            observation = known_actions[action](action_input)
-            next_prompt = f"Observation: {observation}"
-        else:
-            break
-
+    query(client, next_prompt, max_turns=args.max_turns)
 
 
 if __name__ == "__main__":
@@ -5,11 +5,22 @@ from pprint import pprint
 from dotenv import load_dotenv
 from tavily import TavilyClient
 
+from search_cache import DEFAULT_PATH, SearchCache
+
 def main():
     load_dotenv()
     tavily_api_key = os.getenv("TAVILY_API_KEY")
-    tavily_client = TavilyClient(api_key=tavily_api_key)
-    response = tavily_client.search("Who is Luka Modric?")
+    if os.getenv("FAKE_PROVIDERS"):
+        # search answered by a local stand-in, see fake_providers.py
+        from fake_providers import FakeTavilyClient, fake_url
+        fake = fake_url()
+        tavily_client = FakeTavilyClient(fake)
+    else:
+        fake = None
+        tavily_client = TavilyClient(api_key=tavily_api_key)
+    question = "Who is Luka Modric?"
+    # repeated runs are answered from the local search cache
+    response = SearchCache(":memory:" if fake else DEFAULT_PATH).search("tavily", question, lambda: tavily_client.search(question))
     # response = tavily_client.search("What is the weather like in sf?")
     pprint(response)
 
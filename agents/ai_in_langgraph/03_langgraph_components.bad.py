@@ -11,10 +11,10 @@ import operator
 from langchain_core.messages import AnyMessage, SystemMessage, HumanMessage, ToolMessage
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_tavily import TavilySearch
-from langchain_core.tools import tool
-from geopy.geocoders import Nominatim
-from pydantic import BaseModel, Field
-import requests
+
+from fake_chat_model import FakeChatModel
+from fake_providers import fake_url
+from weather import get_weather_forecast, get_weather_forecasts
 
 
 class AgentState(TypedDict):
@@ -64,26 +64,6 @@ class Agent:
         print("Back to the model!")
         return {'messages': results}
 
-geolocator = Nominatim(user_agent="weather-app")
-
-class SearchInput(BaseModel):
-    location:str = Field(description="The city and state, e.g., San Francisco")
-    date:str = Field(description="the forecasting date for when to get the weather format (yyyy-mm-dd)")
-
-@tool("get_weather_forecast", args_schema=SearchInput, return_direct=True)
-def get_weather_forecast(location: str, date: str):
-    """Retrieves the weather using Open-Meteo API for a given location (city) and a date (yyyy-mm-dd). Returns a list dictionary with the time and temperature for each hour."""
-    location = geolocator.geocode(location)
-    if location:
-        try:
-            response = requests.get(f"https://api.open-meteo.com/v1/forecast?latitude={location.latitude}&longitude={location.longitude}&hourly=temperature_2m&start_date={date}&end_date={date}")
-            data = response.json()
-            return {time: temp for time, temp in zip(data["hourly"]["time"], data["hourly"]["temperature_2m"])}
-        except Exception as e:
-            return {"error": str(e)}
-    else:
-        return {"error": "Location not found"}
-
 def main():
     # Load environment variables, including your API key
     load_dotenv()
@@ -103,15 +83,21 @@ def main():
     Only look up information when you are sure of what you want. 
     If you need to look up some information before asking a follow up question, you are allowed to do that!
     """
-    model = ChatGoogleGenerativeAI(
-        google_api_key= os.getenv("GOOGLE_GENAI_API_KEY"),
-        model="gemini-2.5-flash",
-        temperature=0,
-        max_tokens=None,
-        timeout=None,
-        max_retries=2,
-    )
-    abot = Agent(model, [tool], system=prompt)
+    # FAKE_PROVIDERS=1: model, geocoding and forecasts replayed by local stand-ins, see fake_providers.py
+    fake = fake_url()
+    if fake:
+        model = FakeChatModel.from_env()
+    else:
+        model = ChatGoogleGenerativeAI(
+            google_api_key= os.getenv("GOOGLE_GENAI_API_KEY"),
+            model="gemini-2.5-flash",
+            temperature=0,
+            max_tokens=None,
+            timeout=None,
+            max_retries=2,
+        )
+    # the plural tool answers several (location, date) pairs with one open-meteo request
+    abot = Agent(model, [tool, get_weather_forecasts], system=prompt)
 
     abot.graph.get_graph().draw_png("tmp.png")
 
@@ -11,6 +11,13 @@ from langchain_core.messages import AnyMessage, SystemMessage, HumanMessage, Too
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_tavily import TavilySearch
 
+from fake_chat_model import FakeChatModel, fake_search_tool
+from fake_providers import fake_url
+from llm_cache import LLMResponseCache
+from rate_limiter import RateLimitScheduler
+from search_cache import SearchCache, cached_tool
+from tool_runner import ToolRunner
+
 
 class AgentState(TypedDict):
     messages: Annotated[list[AnyMessage], operator.add]
@@ -18,8 +25,10 @@ class AgentState(TypedDict):
 
 class Agent:
 
-    def __init__(self, model, tools, system=""):
+    def __init__(self, model, tools, system="", parallel_tools=True, cache=None, rate_limiter=None):
         self.system = system
+        # optional LLMResponseCache - repeated conversations skip the model round trip
+        self.cache = cache
         graph = StateGraph(AgentState)
         graph.add_node("llm", self.call_openai)
         graph.add_node("action", self.take_action)
@@ -32,7 +41,12 @@ class Agent:
         graph.set_entry_point("llm")
         self.graph = graph.compile()
         self.tools = {t.name: t for t in tools}
+        # run all tool calls of one turn side by side instead of one after another
+        self.tool_runner = ToolRunner(self.tools) if parallel_tools else None
         self.model = model.bind_tools(tools)
+        if rate_limiter:
+            # calls wait client-side for room in the model's RPM/TPM quota
+            self.model = rate_limiter.wrap(model.model, self.model)
 
     def exists_action(self, state: AgentState):
         result = state['messages'][-1]
@@ -42,11 +56,18 @@ class Agent:
         messages = state['messages']
         if self.system:
             messages = [SystemMessage(content=self.system)] + messages
-        message = self.model.invoke(messages)
+        if self.cache:
+            message = self.cache.invoke(self.model, messages)
+        else:
+            message = self.model.invoke(messages)
         return {'messages': [message]}
 
     def take_action(self, state: AgentState):
         tool_calls = state['messages'][-1].tool_calls
+        if self.tool_runner:
+            results = self.tool_runner.run(tool_calls)
+            print("Back to the model!")
+            return {'messages': results}
         results = []
         for t in tool_calls:
             print(f"Calling: {t}")
@@ -63,7 +84,13 @@ class Agent:
 def main():
     load_dotenv()
     tavily_api_key = os.getenv("TAVILY_API_KEY")
-    tool = TavilySearch(tavily_api_key=tavily_api_key, max_results=4)
+    # same tool, answered from the shared search cache when the question was asked before
+    # FAKE_PROVIDERS=1: model and search replayed by local stand-ins, see fake_providers.py
+    fake = fake_url()
+    if fake:
+        tool = cached_tool(fake_search_tool(fake, max_results=4), SearchCache(":memory:"), "tavily")
+    else:
+        tool = cached_tool(TavilySearch(tavily_api_key=tavily_api_key, max_results=4), SearchCache(), "tavily")
 
     system_prompt = """You are a smart research assistant.
 You have access to the following tool:
@@ -84,16 +111,21 @@ Rules:
         ])
     ]
 
-    model = ChatGoogleGenerativeAI(
-        google_api_key=os.getenv("GOOGLE_GENAI_API_KEY"),
-        model="gemini-2.5-flash",
-        temperature=0,
-        max_tokens=None,
-        timeout=None,
-        max_retries=2,
-    )
+    if fake:
+        model = FakeChatModel.from_env()
+    else:
+        model = ChatGoogleGenerativeAI(
+            google_api_key=os.getenv("GOOGLE_GENAI_API_KEY"),
+            model="gemini-2.5-flash",
+            temperature=0,
+            max_tokens=None,
+            timeout=None,
+            max_retries=2,
+        )
 
-    abot = Agent(model, [tool], system=system_prompt)
+    # one question per run: only a cache kept on disk ever gets a hit (LANGGRAPH_LLM_CACHE_PATH)
+    cache = LLMResponseCache(namespace=model.model) if fake else LLMResponseCache.persistent(namespace=model.model)
+    abot = Agent(model, [tool], system=system_prompt, cache=cache, rate_limiter=None if fake else RateLimitScheduler())
 
     # Combine the example and the actual question
     question = "What is the weather in sf?"
@@ -103,6 +135,8 @@ Rules:
     result = abot.graph.invoke({"messages": messages})
     # pprint(result)
     print(result['messages'][-1].content)
+    print("llm cache:", abot.cache.stats())
+    cache.close()
    
 
 if __name__ == "__main__":
@@ -1,5 +1,8 @@
 #!/usr/bin/env python3
+import ast
+import asyncio
 import os
+import sys
 from pprint import pprint
 import requests
 from bs4 import BeautifulSoup
@@ -11,23 +14,91 @@ from dotenv import load_dotenv
 from tavily import TavilyClient
 import json
 from pygments import highlight, lexers, formatters
+try:
+    import orjson  # optional, several times faster than the stdlib json
+except ImportError:
+    orjson = None
 
-def tavily_search(question):
+from search_cache import SearchCache, unique_urls
+from web_text import fetch_visible_texts, stream_visible_text
+
+# FAKE_PROVIDERS=1: search results and pages come from a local stand-in, see fake_providers.py
+if os.getenv("FAKE_PROVIDERS"):
+    from fake_providers import FakeDDGS, FakeTavilyClient, fake_url
+    fake = fake_url()
+else:
+    fake = None
+search_cache = SearchCache(":memory:") if fake else SearchCache()
+
+def parse_payload(text):
+    """Tavily content as data: JSON, else a Python literal (single quotes, True/None), else the text itself."""
+    try:
+        return orjson.loads(text) if orjson else json.loads(text)
+    except ValueError:
+        pass
+    try:
+        # literal_eval only builds literals - nothing in the payload gets executed
+        return string_keys(ast.literal_eval(text))
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        # TypeError: an unhashable key, e.g. "{[1]: 2}"
+        return text
+
+def string_keys(obj):
+    # literal_eval builds dicts with int/tuple/None keys, which orjson and json.dumps refuse
+    if isinstance(obj, dict):
+        return {k if isinstance(k, str) else str(k): string_keys(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return [string_keys(v) for v in obj]
+    return obj
+
+def jsonable(obj):
+    # what literal_eval can produce but JSON cannot hold
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return obj.decode("utf-8", "replace")
+    return str(obj)
+
+def dumps_compact(obj):
+    if orjson:
+        return orjson.dumps(obj, default=jsonable).decode()
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=jsonable)
+
+def normalize_result(result):
+    return {
+        "url": result.get("url"),
+        "title": result.get("title"),
+        "score": result.get("score"),
+        "content": parse_payload(result.get("content") or ""),
+    }
+
+def tavily_search(question, max_results=1, jsonl_path=None):
     load_dotenv()
     tavily_api_key = os.getenv("TAVILY_API_KEY")
-    tavily_client = TavilyClient(api_key=tavily_api_key)
-    response = tavily_client.search(question, max_results=1)
-    data = response["results"][0]["content"]
-    # parse JSON
-    parsed_json = json.loads(data.replace("'", '"'))
+    tavily_client = FakeTavilyClient(fake) if fake else TavilyClient(api_key=tavily_api_key)
+    response = search_cache.search("tavily", question, lambda: tavily_client.search(question, max_results=max_results),
+                                   params={"max_results": max_results})
+    records = [normalize_result(r) for r in response["results"]]
 
-    # pretty print JSON with syntax highlighting
-    formatted_json = json.dumps(parsed_json, indent=4)
-    colorful_json = highlight(formatted_json,
-                              lexers.JsonLexer(),
-                              formatters.TerminalFormatter())
+    if jsonl_path:
+        # compact JSONL for downstream batch processing
+        with open(jsonl_path, "a") as outfile:
+            outfile.writelines(dumps_compact(r) + "\n" for r in records)
+
+    if not sys.stdout.isatty():
+        # piped or redirected: no pretty printing, no colors, one record per line
+        for record in records:
+            print(dumps_compact(record))
+        return records
 
-    print(colorful_json)
+    # pretty print JSON with syntax highlighting
+    for record in records:
+        formatted_json = json.dumps(record["content"], indent=4, default=jsonable)
+        colorful_json = highlight(formatted_json,
+                                  lexers.JsonLexer(),
+                                  formatters.TerminalFormatter())
+        print(colorful_json)
+    return records
 
 def scrape_weather_info(url):
     """Scrape content from the given URL"""
@@ -44,11 +115,21 @@ def scrape_weather_info(url):
     soup = BeautifulSoup(response.text, 'html.parser')
     return soup
 
-def regular_search(question):
-    ddg = DDGS()
+async def print_pages(urls, max_chars, total_chars=None):
+    # pages are printed in the order they arrive, not the order of the results;
+    # no more than max_chars per page in total unless told otherwise
+    if total_chars is None:
+        total_chars = max_chars * len(urls)
+    async for url, text in fetch_visible_texts(urls, max_chars=max_chars, total_chars=total_chars):
+        print(f"Website: {url}\n\n")
+        print(text or "Failed to retrieve the webpage.")
+
+def regular_search(question, streaming=True, parallel=True, max_chars=50000, max_results=1, total_chars=None):
+    ddg = FakeDDGS(fake) if fake else DDGS()
     try:
-        results = ddg.text(question, max_results=1)
-        results =  [i["href"] for i in results]
+        # a cached answer (even a stale one) is returned if DDG refuses to talk to us
+        results = search_cache.search("ddg", question, lambda: [i["href"] for i in ddg.text(question, max_results=max_results)],
+                                      params={"max_results": max_results})
     except Exception as e:
         print(f"returning previous results due to exception reaching ddg.")
         results = [ # cover case where DDG rate limits due to high deeplearning.ai volume
@@ -56,10 +137,31 @@ def regular_search(question):
             "https://weather.com/weather/hourbyhour/l/54f9d8baac32496f6b5497b4bf7a277c3e2e6cc5625de69680e6169e7e38e9a8",
         ]
 
+    # the same page under another URL (www., tracking parameters, ...) is fetched only once
+    results = unique_urls(results)
+    if total_chars is None:
+        # DDG's fallback list can be longer than max_results: the budget stays max_chars per result asked for
+        total_chars = max_chars * max_results
+
+    if streaming and parallel:
+        asyncio.run(print_pages(results, max_chars, total_chars))
+        return
+
+    collected = 0
     for url in results:
-        soup = scrape_weather_info(url)
+        if collected >= total_chars:
+            break
         print(f"Website: {url}\n\n")
-        print(str(soup.body)[:50000]) # limit long outputs
+        if streaming:
+            # visible text only, and the download stops once max_chars of it are in
+            text = stream_visible_text(url, max_chars=min(max_chars, total_chars - collected))
+            collected += len(text or "")
+            print(text or "Failed to retrieve the webpage.")
+            continue
+        soup = scrape_weather_info(url)
+        body = str(soup.body)[:min(max_chars, total_chars - collected)] # limit long outputs
+        collected += len(body)
+        print(body)
 
 def main():
     city = "San Francisco"
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 import os
 import re
+from contextlib import nullcontext
 from pprint import pprint
 
 from dotenv import load_dotenv
@@ -10,7 +11,15 @@ import operator
 from langchain_core.messages import AnyMessage, SystemMessage, HumanMessage, ToolMessage, AIMessage
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_tavily import TavilySearch
-from langgraph.checkpoint.sqlite import SqliteSaver
+
+from checkpointer import Compactor, PooledSqliteSaver, RetentionPolicy
+from fake_chat_model import FakeChatModel, fake_search_tool
+from fake_providers import fake_url
+from llm_cache import LLMResponseCache
+from rate_limiter import RateLimitScheduler
+from search_cache import SearchCache, SeenUrls, cached_tool
+from tool_runner import ToolRunner
+from tracing import Tracer
 
 class AgentState(TypedDict):
     messages: Annotated[list[AnyMessage], operator.add]
@@ -18,11 +27,19 @@ class AgentState(TypedDict):
 
 class Agent:
 
-    def __init__(self, model, tools, checkpointer, system=""):
+    def __init__(self, model, tools, checkpointer, system="", parallel_tools=True, cache=None, rate_limiter=None,
+                 tracer=None):
         self.system = system
+        # built once, not on every hop
+        self.system_message = SystemMessage(content=system) if system else None
+        # optional LLMResponseCache - repeated conversations skip the model round trip
+        self.cache = cache
+        # optional tracing.Tracer - spans per node, tool call and checkpoint write, token counts
+        self.tracer = tracer
+        self.model_name = getattr(model, "model", "")
         graph = StateGraph(AgentState)
-        graph.add_node("llm", self.call_openai)
-        graph.add_node("action", self.take_action)
+        graph.add_node("llm", tracer.node("llm", self.call_openai) if tracer else self.call_openai)
+        graph.add_node("action", tracer.node("action", self.take_action) if tracer else self.take_action)
         graph.add_conditional_edges(
             "llm",
             self.exists_action,
@@ -30,9 +47,18 @@ class Agent:
         )
         graph.add_edge("action", "llm")
         graph.set_entry_point("llm")
+        if tracer:
+            tracer.instrument_saver(checkpointer)
         self.graph = graph.compile(checkpointer=checkpointer)
         self.tools = {t.name: t for t in tools}
+        # run all tool calls of one turn side by side instead of one after another
+        self.tool_runner = ToolRunner(self.tools) if parallel_tools else None
+        if tracer and self.tool_runner:
+            tracer.instrument_tool_runner(self.tool_runner)
         self.model = model.bind_tools(tools)
+        if rate_limiter:
+            # calls wait client-side for room in the model's RPM/TPM quota
+            self.model = rate_limiter.wrap(model.model, self.model)
 
     def exists_action(self, state: AgentState):
         result = state['messages'][-1]
@@ -41,13 +67,22 @@ class Agent:
     # THIS IS THE SYNCH STREAMING (USING INVOKE)
     def call_openai(self, state: AgentState):
         messages = state['messages']
-        if self.system:
-            messages = [SystemMessage(content=self.system)] + messages
-        message = self.model.invoke(messages)
+        if self.system_message:
+            messages = [self.system_message, *messages]
+        if self.cache:
+            message = self.cache.invoke(self.model, messages)
+        else:
+            message = self.model.invoke(messages)
+        if self.tracer:
+            self.tracer.record_llm(message, self.model_name)
         return {'messages': [message]}
 
     def take_action(self, state: AgentState):
         tool_calls = state['messages'][-1].tool_calls
+        if self.tool_runner:
+            results = self.tool_runner.run(tool_calls)
+            print("Back to the model!")
+            return {'messages': results}
         results = []
         for t in tool_calls:
             print(f"Calling: {t}")
@@ -55,7 +90,8 @@ class Agent:
                 print("\n ....bad tool name....")
                 result = "bad tool name, retry"
             else:
-                result = self.tools[t['name']].invoke(t['args'])
+                with self.tracer.tool(t['name']) if self.tracer else nullcontext():
+                    result = self.tools[t['name']].invoke(t['args'])
             results.append(ToolMessage(tool_call_id=t['id'], name=t['name'], content=str(result)))
         print("Back to the model!")
         return {'messages': results}
@@ -63,7 +99,15 @@ class Agent:
 def main():
     load_dotenv()
     tavily_api_key = os.getenv("TAVILY_API_KEY")
-    tool = TavilySearch(tavily_api_key=tavily_api_key, max_results=4)
+    # same tool, answered from the shared search cache when the question was asked before
+    # FAKE_PROVIDERS=1: model and search replayed by local stand-ins, see fake_providers.py
+    fake = fake_url()
+    if fake:
+        tool = cached_tool(fake_search_tool(fake, max_results=4), SearchCache(":memory:"), "tavily",
+                           seen=SeenUrls())
+    else:
+        tool = cached_tool(TavilySearch(tavily_api_key=tavily_api_key, max_results=4), SearchCache(), "tavily",
+                           seen=SeenUrls())
 
     system_prompt = """You are a smart research assistant.
 You have access to the following tool:
@@ -84,17 +128,26 @@ Rules:
         ])
     ]
 
-    model = ChatGoogleGenerativeAI(
-        google_api_key=os.getenv("GOOGLE_GENAI_API_KEY"),
-        model="gemini-2.5-flash",
-        temperature=0,
-        max_tokens=None,
-        timeout=None,
-        max_retries=2,
-    )
+    if fake:
+        model = FakeChatModel.from_env()
+    else:
+        model = ChatGoogleGenerativeAI(
+            google_api_key=os.getenv("GOOGLE_GENAI_API_KEY"),
+            model="gemini-2.5-flash",
+            temperature=0,
+            max_tokens=None,
+            timeout=None,
+            max_retries=2,
+        )
 
-    with SqliteSaver.from_conn_string(":memory:") as memory:
-        abot = Agent(model, [tool], system=system_prompt, checkpointer=memory)
+    # set AGENT_CHECKPOINT_DB to a file path to keep threads across restarts
+    with (PooledSqliteSaver.from_path(os.getenv("AGENT_CHECKPOINT_DB", ":memory:")) as memory,
+          Compactor(memory, RetentionPolicy(keep_last=20, snapshot_every=50))):
+        # AGENT_TRACE_FILE: OTLP-shaped spans as JSON lines; AGENT_METRICS_FILE: Prometheus text
+        tracer = Tracer(os.getenv("AGENT_TRACE_FILE"))
+        abot = Agent(model, [tool], system=system_prompt, checkpointer=memory,
+                     cache=LLMResponseCache(namespace=model.model), rate_limiter=None if fake else RateLimitScheduler(),
+                     tracer=tracer)
 
         question = "What is the weather in sf?"
         messages = few_shot + [HumanMessage(content=question)]
@@ -118,5 +171,13 @@ Rules:
             for v in event.values():
                 print(v['messages'][-1].content)
 
+        print("llm cache:", abot.cache.stats())
+        print("checkpoints:", memory.thread_stats())
+        for name, count, total, slowest in tracer.summary():
+            print(f"{name:<28} {count:>5} calls {total:8.3f}s total {slowest:8.3f}s slowest")
+        if os.getenv("AGENT_METRICS_FILE"):
+            tracer.write_prometheus(os.getenv("AGENT_METRICS_FILE"))
+        tracer.close()
+
 if __name__ == "__main__":
     main()
@@ -19,16 +19,26 @@ And ChatGoogleGenerativeAI—bless its over-engineered soul—is apparently dete
 
 import asyncio
 import os
+import uuid
+from collections import OrderedDict
 
 from dotenv import load_dotenv
-from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from langgraph.graph import StateGraph, END
 from typing import TypedDict, Annotated
 import operator
 from langchain_core.messages import AnyMessage, SystemMessage, HumanMessage, ToolMessage, AIMessage
+from langchain_core.messages import message_chunk_to_message
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_tavily import TavilySearch
 
+from checkpointer import open_async_saver
+from fake_chat_model import FakeChatModel, fake_search_tool
+from fake_providers import fake_url
+from search_cache import SearchCache, SeenUrls, cached_tool
+from rate_limiter import RateLimitScheduler
+from speculative import SpeculativeCalls
+from tool_runner import ToolRunner
+
 
 class AgentState(TypedDict):
     messages: Annotated[list[AnyMessage], operator.add]
@@ -36,7 +46,8 @@ class AgentState(TypedDict):
 
 class Agent:
 
-    def __init__(self, model, tools, checkpointer, system=""):
+    def __init__(self, model, tools, checkpointer, system="", parallel_tools=True, tool_timeout=30,
+                 stream_final_answer=True, speculative_tools=False, rate_limiter=None):
         self.system = system
         graph = StateGraph(AgentState)
         graph.add_node("llm", self.call_openai)
@@ -50,22 +61,72 @@ class Agent:
         graph.set_entry_point("llm")
         self.graph = graph.compile(checkpointer=checkpointer)
         self.tools = {t.name: t for t in tools}
+        # run all tool calls of one turn side by side instead of one after another
+        self.tool_runner = ToolRunner(self.tools, timeout=tool_timeout) if parallel_tools else None
+        # one streamed call per turn: a final answer reaches on_chat_model_stream as it is generated,
+        # a turn that calls tools comes back with (mostly) empty content
         self.model = model.bind_tools(tools)
+        if rate_limiter:
+            # calls wait client-side for room in the model's RPM/TPM quota
+            self.model = rate_limiter.wrap(model.model, self.model)
+        self.stream_final_answer = stream_final_answer
+        # speculative mode also starts tool calls from the stream, before the message is complete
+        self.speculative = speculative_tools and self.tool_runner is not None
+        self._speculative = OrderedDict()  # AIMessage id -> SpeculativeCalls, until take_action collects them
 
     def exists_action(self, state: AgentState):
         result = state['messages'][-1]
         return len(result.tool_calls) > 0
 
     # FOR THE ASYNCH STREAMING HERE
+    # Every turn is a single streamed call on the tools-bound model: when it answers, its tokens
+    # are the answer already (on_chat_model_stream), when it calls tools SpeculativeCalls can start
+    # them early. No second generation of the final answer. A wrapper that does not stream with
+    # tools bound delivers the answer in one chunk - no slower than ainvoke.
     async def call_openai(self, state: AgentState):
         messages = state['messages']
         if self.system:
             messages = [SystemMessage(content=self.system)] + messages
-        async for chunk in self.model.astream(messages):
-            yield {'messages': [chunk]}
-
-    def take_action(self, state: AgentState):
-        tool_calls = state['messages'][-1].tool_calls
+        if not self.stream_final_answer and not self.speculative:
+            return {'messages': [await self.model.ainvoke(messages)]}
+        return {'messages': [await self.stream_turn(messages)]}
+
+    async def stream_turn(self, messages):
+        speculative = SpeculativeCalls(self.tool_runner.acall) if self.speculative else None
+        message = None
+        try:
+            async for chunk in self.model.astream(messages):
+                if speculative:
+                    speculative.feed(chunk)
+                message = chunk if message is None else message + chunk
+        except BaseException:
+            if speculative:
+                speculative.discard()
+            raise
+        message = message_chunk_to_message(message)
+        if speculative is None:
+            return message
+        if not message.tool_calls:
+            speculative.discard()
+            return message
+        if message.id is None:
+            message.id = f"run-{uuid.uuid4()}"
+        self._speculative[message.id] = speculative
+        while len(self._speculative) > 64:
+            # a thread that never reached its action node
+            self._speculative.popitem(last=False)[1].discard()
+        return message
+
+    # async action node: a Tavily round trip must not block the event loop that
+    # astream_events - and every other thread_id on it - is running on
+    async def take_action(self, state: AgentState):
+        message = state['messages'][-1]
+        tool_calls = message.tool_calls
+        if self.tool_runner:
+            speculative = self._speculative.pop(message.id, None)
+            results = await self.tool_runner.arun(tool_calls, speculative)
+            print("Back to the model!")
+            return {'messages': results}
         results = []
         for t in tool_calls:
             print(f"Calling: {t}")
@@ -73,7 +134,7 @@ class Agent:
                 print("\n ....bad tool name....")
                 result = "bad tool name, retry"
             else:
-                result = self.tools[t['name']].invoke(t['args'])
+                result = await self.tools[t['name']].ainvoke(t['args'])
             results.append(ToolMessage(tool_call_id=t['id'], name=t['name'], content=str(result)))
         print("Back to the model!")
         return {'messages': results}
@@ -81,7 +142,15 @@ class Agent:
 async def main():
     load_dotenv()
     tavily_api_key = os.getenv("TAVILY_API_KEY")
-    tool = TavilySearch(tavily_api_key=tavily_api_key, max_results=4)
+    # same tool, answered from the shared search cache when the question was asked before
+    # FAKE_PROVIDERS=1: model and search replayed by local stand-ins, see fake_providers.py
+    fake = fake_url()
+    if fake:
+        tool = cached_tool(fake_search_tool(fake, max_results=4), SearchCache(":memory:"), "tavily",
+                           seen=SeenUrls())
+    else:
+        tool = cached_tool(TavilySearch(tavily_api_key=tavily_api_key, max_results=4), SearchCache(), "tavily",
+                           seen=SeenUrls())
 
     system_prompt = """You are a smart research assistant.
 You have access to the following tool:
@@ -102,18 +171,23 @@ Rules:
         ])
     ]
 
-    model = ChatGoogleGenerativeAI(
-        google_api_key=os.getenv("GOOGLE_GENAI_API_KEY"),
-        model="gemini-2.5-flash",
-        temperature=0,
-        max_tokens=None,
-        timeout=None,
-        max_retries=2,
-        disable_streaming=False, stream=True
-    )
-
-    async with AsyncSqliteSaver.from_conn_string(":memory:") as memory:
-        abot = Agent(model, [tool], system=system_prompt, checkpointer=memory)
+    if fake:
+        model = FakeChatModel.from_env()
+    else:
+        model = ChatGoogleGenerativeAI(
+            google_api_key=os.getenv("GOOGLE_GENAI_API_KEY"),
+            model="gemini-2.5-flash",
+            temperature=0,
+            max_tokens=None,
+            timeout=None,
+            max_retries=2,
+            disable_streaming=False, stream=True
+        )
+
+    # set AGENT_CHECKPOINT_DB to a file path to keep threads across restarts
+    async with open_async_saver(os.getenv("AGENT_CHECKPOINT_DB", ":memory:")) as memory:
+        abot = Agent(model, [tool], system=system_prompt, checkpointer=memory, speculative_tools=True,
+                     rate_limiter=None if fake else RateLimitScheduler())
 
         question = "What is the weather in SF?"
         messages = few_shot + [HumanMessage(content=question)]
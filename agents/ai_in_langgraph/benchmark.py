@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Where does the time of an agent run go?
+
+Runs the agents of the numbered scripts - the from-scratch ReAct loop (01),
+the LangGraph Agent with graph.invoke (04), with graph.stream and the pooled
+SQLite checkpointer (06), and with astream_events on the async saver (07) -
+against the fake providers (default) or the live ones, at several concurrency
+levels, and records
+
+- latency of whole runs (p50/p95/p99), runs and messages per second,
+- wall time per node: "llm" and "action",
+- checkpointer calls (put/put_writes/get_tuple and their async versions),
+- "overhead": run time not spent in llm or action - graph scheduling,
+  state merging, checkpointing.
+
+The scripts are not changed: their Agent classes are subclassed so each node
+is timed, and the saver's methods are wrapped on the instance. Results are
+written as JSON together with the git commit they were measured at;
+`--compare old.json` prints the p50 change against an earlier run.
+
+    FAKE_LATENCY=0.05 python benchmark.py --scenarios graph,async --concurrency 1,8,32 --runs 64
+"""
+import argparse
+import asyncio
+import contextlib
+import contextvars
+import importlib.util
+import inspect
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from langchain_core.messages import HumanMessage
+
+HERE = Path(__file__).resolve().parent
+SCENARIOS = ("scratch", "graph", "persistent", "async")
+SYSTEM_PROMPT = "You are a smart research assistant. Use the search engine to look up information."
+SAVER_METHODS = ("put", "put_writes", "get_tuple", "aput", "aput_writes", "aget_tuple")
+
+_current_run = contextvars.ContextVar("benchmark_run", default=None)
+
+
+def load_script(filename):
+    """Import a numbered script (not a valid module name) by path - a fresh copy, free to be patched."""
+    name = "bench_" + Path(filename).stem.replace(".", "_")
+    spec = importlib.util.spec_from_file_location(name, HERE / filename)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered) + 0.5) - 1))]
+
+
+def summarize(values):
+    if not values:
+        return {"count": 0}
+    return {"count": len(values), "total": sum(values), "mean": sum(values) / len(values),
+            "p50": percentile(values, 50), "p95": percentile(values, 95), "p99": percentile(values, 99),
+            "max": max(values)}
+
+
+class Recorder:
+    """Span durations, overall and per run (the run is found through a context variable)."""
+
+    def __init__(self):
+        self.spans = defaultdict(list)
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name, seconds):
+        run = _current_run.get()
+        with self._lock:
+            self.spans[name].append(seconds)
+            if run is not None:
+                run[name] = run.get(name, 0.0) + seconds
+
+    def timed(self, name, function):
+        if inspect.iscoroutinefunction(function):
+            async def timed(*args, **kwargs):
+                with self.span(name):
+                    return await function(*args, **kwargs)
+        else:
+            def timed(*args, **kwargs):
+                with self.span(name):
+                    return function(*args, **kwargs)
+        return timed
+
+    def wrap_saver(self, saver):
+        for method in SAVER_METHODS:
+            if hasattr(saver, method):
+                setattr(saver, method, self.timed(f"checkpoint.{method}", getattr(saver, method)))
+        return saver
+
+
+def timed_agent(agent_class, recorder):
+    """Subclass of a script's Agent with both graph nodes timed."""
+    attributes = {}
+    for node, method in (("llm", "call_openai"), ("action", "take_action")):
+        attributes[method] = recorder.timed(node, getattr(agent_class, method))
+    return type(f"Timed{agent_class.__name__}", (agent_class,), attributes)
+
+
+class Backend:
+
+    def __init__(self, kind):
+        self.kind = kind
+        if kind == "fake":
+            from fake_providers import fake_url
+            os.environ.setdefault("FAKE_PROVIDERS", "1")
+            self.url = fake_url()
+
+    def chat_model(self):
+        if self.kind == "fake":
+            from fake_chat_model import FakeChatModel
+            return FakeChatModel.from_env()
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        return ChatGoogleGenerativeAI(google_api_key=os.getenv("GOOGLE_GENAI_API_KEY"), model="gemini-2.5-flash",
+                                      temperature=0, max_retries=2)
+
+    def tools(self):
+        if self.kind == "fake":
+            from fake_chat_model import fake_search_tool
+            return [fake_search_tool(self.url, max_results=4)]
+        from langchain_tavily import TavilySearch
+        return [TavilySearch(tavily_api_key=os.getenv("TAVILY_API_KEY"), max_results=4)]
+
+    def openai_client(self):
+        from openai import OpenAI
+        if self.kind == "fake":
+            return OpenAI(api_key="fake", base_url=f"{self.url}/v1/")
+        return OpenAI(api_key=os.getenv("GOOGLE_GENAI_API_KEY"),
+                      base_url="https://generativelanguage.googleapis.com/v1beta/openai/")
+
+
+# ---------------------------------------------------------------- scenarios
+# each returns (sync or async) run(n) -> number of messages, plus a cleanup callable
+
+def scratch_scenario(backend, recorder):
+    script = load_script("01_agent_from_scratch.py")
+    client = backend.openai_client()
+
+    class TimedAgent(script.Agent):
+        execute = recorder.timed("llm", script.Agent.execute)
+
+    script.Agent = TimedAgent  # query() builds its Agent from the module global
+    actions = {name: recorder.timed("action", f) for name, f in script.get_known_actions().items()}
+    script.get_known_actions = lambda: actions
+
+    def run(n):
+        _, turns = script.query(client, f"Question {n}: I have 2 dogs, a border collie and a scottish terrier. "
+                                        f"What is their combined weight?", verbose=False)
+        return 2 * turns
+
+    return run, lambda: None
+
+
+def graph_scenario(backend, recorder):
+    script = load_script("04_langgraph_components.fixed.py")
+    agent = timed_agent(script.Agent, recorder)(backend.chat_model(), backend.tools(), system=SYSTEM_PROMPT)
+
+    def run(n):
+        result = agent.graph.invoke({"messages": [HumanMessage(content=f"What is the weather in city {n}?")]})
+        return len(result["messages"])
+
+    return run, agent.tool_runner.shutdown if agent.tool_runner else (lambda: None)
+
+
+def persistent_scenario(backend, recorder):
+    script = load_script("06_persistence_and_streaming.py")
+    saver_context = script.PooledSqliteSaver.from_path(os.getenv("AGENT_CHECKPOINT_DB", ":memory:"))
+    memory = recorder.wrap_saver(saver_context.__enter__())
+    agent = timed_agent(script.Agent, recorder)(backend.chat_model(), backend.tools(), system=SYSTEM_PROMPT,
+                                                checkpointer=memory)
+
+    def run(n):
+        thread = {"configurable": {"thread_id": f"bench-{n}"}}
+        messages = 0
+        for event in agent.graph.stream({"messages": [HumanMessage(content=f"What is the weather in city {n}?")]},
+                                        thread):
+            messages += sum(len(v["messages"]) for v in event.values())
+        return messages
+
+    def cleanup():
+        if agent.tool_runner:
+            agent.tool_runner.shutdown()
+        saver_context.__exit__(None, None, None)
+
+    return run, cleanup
+
+
+async def async_scenario(backend, recorder, stack):
+    script = load_script("07_async_streaming.py")
+    memory = recorder.wrap_saver(
+        await stack.enter_async_context(script.open_async_saver(os.getenv("AGENT_CHECKPOINT_DB", ":memory:"))))
+    agent = timed_agent(script.Agent, recorder)(backend.chat_model(), backend.tools(), system=SYSTEM_PROMPT,
+                                                checkpointer=memory)
+
+    async def run(n):
+        thread = {"configurable": {"thread_id": f"bench-{n}"}}
+        messages = 0
+        async for event in agent.graph.astream_events(
+                {"messages": [HumanMessage(content=f"What is the weather in city {n}?")]}, thread, version="v1"):
+            if event["event"] == "on_chat_model_end":
+                messages += 1
+        return messages
+
+    return run
+
+
+# ---------------------------------------------------------------- driver
+
+def measure(run, n):
+    record = {}
+    token = _current_run.set(record)
+    started = time.perf_counter()
+    try:
+        record["messages"] = run(n)
+    except Exception as e:
+        record["error"] = repr(e)
+    finally:
+        record["latency"] = time.perf_counter() - started
+        _current_run.reset(token)
+    return record
+
+
+async def ameasure(run, n, slots):
+    async with slots:
+        record = {}
+        token = _current_run.set(record)
+        started = time.perf_counter()
+        try:
+            record["messages"] = await run(n)
+        except Exception as e:
+            record["error"] = repr(e)
+        finally:
+            record["latency"] = time.perf_counter() - started
+            _current_run.reset(token)
+        return record
+
+
+def report(scenario, concurrency, recorder, records, wall):
+    ok = [r for r in records if "error" not in r]
+    for r in ok:
+        r["overhead"] = max(0.0, r["latency"] - r.get("llm", 0.0) - r.get("action", 0.0))
+    spans = {name: summarize(values) for name, values in sorted(recorder.spans.items())}
+    spans["overhead"] = summarize([r["overhead"] for r in ok])
+    messages = sum(r["messages"] for r in ok)
+    return {"scenario": scenario, "concurrency": concurrency, "runs": len(records),
+            "errors": len(records) - len(ok), "first_error": next((r["error"] for r in records if "error" in r), None),
+            "wall_seconds": wall, "runs_per_second": len(ok) / wall if wall else None,
+            "messages_per_second": messages / wall if wall else None,
+            "latency": summarize([r["latency"] for r in ok]), "spans": spans}
+
+
+def run_sync(scenario, factory, backend, concurrency, runs, warmup):
+    recorder = Recorder()
+    run, cleanup = factory(backend, recorder)
+    try:
+        for n in range(warmup):
+            measure(run, -1 - n)
+        recorder.spans.clear()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            records = list(pool.map(lambda n: contextvars.copy_context().run(measure, run, n), range(runs)))
+        return report(scenario, concurrency, recorder, records, time.perf_counter() - started)
+    finally:
+        cleanup()
+
+
+async def run_async(scenario, backend, concurrency, runs, warmup):
+    recorder = Recorder()
+    async with contextlib.AsyncExitStack() as stack:
+        run = await async_scenario(backend, recorder, stack)
+        slots = asyncio.Semaphore(concurrency)
+        for n in range(warmup):
+            await ameasure(run, -1 - n, slots)
+        recorder.spans.clear()
+        started = time.perf_counter()
+        records = await asyncio.gather(*(ameasure(run, n, slots) for n in range(runs)))
+        return report(scenario, concurrency, recorder, records, time.perf_counter() - started)
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=HERE, capture_output=True, text=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain"], cwd=HERE, capture_output=True, text=True).stdout)
+    except OSError:
+        return None, None
+    return commit or None, dirty
+
+
+def print_header():
+    print(f"{'scenario':<11}{'conc':>5}{'runs/s':>9}{'msg/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}"
+          f"{'llm p50':>9}{'act p50':>9}{'ovh p50':>9}{'err':>5}")
+
+
+def print_row(r):
+    latency, spans = r["latency"], r["spans"]
+
+    def p50(name):
+        value = spans.get(name, {}).get("p50")
+        return f"{value:9.3f}" if value is not None else f"{'-':>9}"
+
+    print(f"{r['scenario']:<11}{r['concurrency']:>5}{r['runs_per_second'] or 0:9.2f}"
+          f"{r['messages_per_second'] or 0:9.2f}{latency.get('p50') or 0:9.3f}{latency.get('p95') or 0:9.3f}"
+          f"{latency.get('p99') or 0:9.3f}{p50('llm')}{p50('action')}{p50('overhead')}{r['errors']:>5}")
+
+
+def compare(old_path, results):
+    with open(old_path) as infile:
+        old = json.load(infile)
+    before = {(r["scenario"], r["concurrency"]): r for r in old["results"]}
+    print(f"\nchange against {old.get('commit', '?')[:10]} (p50, negative is faster)")
+    for r in results:
+        previous = before.get((r["scenario"], r["concurrency"]))
+        if not previous:
+            continue
+        for label, new, base in (("latency", r["latency"].get("p50"), previous["latency"].get("p50")),
+                                 ("overhead", r["spans"]["overhead"].get("p50"),
+                                  previous["spans"].get("overhead", {}).get("p50"))):
+            if new is not None and base:
+                print(f"  {r['scenario']:<11} c={r['concurrency']:<4} {label:<9} {base:.4f}s -> {new:.4f}s "
+                      f"({(new - base) / base:+.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark agent loop overhead and tool latency")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma separated, from {SCENARIOS}")
+    parser.add_argument("--backend", choices=("fake", "live"), default="fake")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma separated concurrency levels")
+    parser.add_argument("--runs", type=int, default=32, help="runs per scenario and concurrency level")
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--out", help="JSON results file (default benchmark-<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--verbose", action="store_true", help="keep the agents' own printing")
+    args = parser.parse_args()
+
+    backend = Backend(args.backend)
+    factories = {"scratch": scratch_scenario, "graph": graph_scenario, "persistent": persistent_scenario}
+    results = []
+    print_header()
+    for scenario in args.scenarios.split(","):
+        for concurrency in (int(c) for c in args.concurrency.split(",")):
+            # the agents print every tool call; that is not what is being measured
+            quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+            with quiet:
+                if scenario == "async":
+                    result = asyncio.run(run_async(scenario, backend, concurrency, args.runs, args.warmup))
+                else:
+                    result = run_sync(scenario, factories[scenario], backend, concurrency, args.runs, args.warmup)
+            results.append(result)
+            print_row(result)
+
+    commit, dirty = git_commit()
+    payload = {"commit": commit, "dirty": dirty, "timestamp": time.time(), "backend": args.backend,
+               "python": platform.python_version(), "platform": platform.platform(),
+               "settings": {k: os.getenv(k) for k in ("FAKE_LATENCY", "FAKE_TOKENS_PER_SECOND", "FAKE_TOOL_LATENCY")},
+               "runs": args.runs, "results": results}
+    out = args.out or f"benchmark-{(commit or 'unknown')[:10]}{'-dirty' if dirty else ''}.json"
+    with open(out, "w") as outfile:
+        json.dump(payload, outfile, indent=2)
+    print(f"\nresults written to {out}")
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+Production mode for the SQLite checkpointers.
+
+SqliteSaver.from_conn_string(":memory:") loses every thread at exit and funnels
+reads and writes through one connection. PooledSqliteSaver instead:
+
+- keeps the checkpoints in a file in WAL mode with synchronous=NORMAL, so
+  readers never wait for the writer and a commit costs no fsync,
+- serves get_tuple/list from a small pool of read-only connections,
+- buffers the task writes of a superstep and commits them together with the
+  checkpoint that closes the superstep - one transaction per step instead of
+  one per task. Special writes (errors, interrupts) are committed immediately,
+- prunes old checkpoints per thread_id following a RetentionPolicy: the
+  newest N plus a periodic snapshot every K steps. A Compactor thread can
+  apply the policy in the background, and thread_stats() reports checkpoint
+  counts and bytes per thread.
+
+It builds on DeltaSqliteSaver, so messages are logged incrementally as well.
+open_async_saver gives AsyncSqliteSaver the same file and pragmas.
+"""
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+import aiosqlite
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from message_log import DeltaSqliteSaver
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",     # durable across app crashes, fsync only at WAL checkpoints
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",      # 64 MB page cache
+    "PRAGMA mmap_size=268435456",
+)
+
+
+def connect(path, read_only=False):
+    if read_only:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+    else:
+        conn = sqlite3.connect(path, check_same_thread=False)
+    for pragma in PRAGMAS:
+        if read_only and "journal_mode" in pragma:
+            continue
+        conn.execute(pragma)
+    return conn
+
+
+class ReaderPool:
+
+    def __init__(self, path, size=4):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def cursor(self):
+        conn = self._acquire()
+        cur = conn.cursor()
+        try:
+            yield cur
+        finally:
+            cur.close()
+            self._idle.put(conn)
+
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return connect(self.path, read_only=True)
+        return self._idle.get()  # all readers busy - wait for one
+
+
+class PooledSqliteSaver(DeltaSqliteSaver):
+
+    def __init__(self, conn, path=":memory:", readers=4, *, serde=None):
+        super().__init__(conn, serde=serde)
+        # an in-memory database is private to its connection, so it cannot have readers
+        self.readers = ReaderPool(path, readers) if readers and path != ":memory:" else None
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._local = threading.local()
+
+    @classmethod
+    @contextmanager
+    def from_path(cls, path, readers=4):
+        conn = connect(path)
+        saver = cls(conn, path, readers)
+        try:
+            yield saver
+        finally:
+            saver.flush()
+            if saver.readers:
+                saver.readers.close()
+            conn.close()
+
+    @contextmanager
+    def cursor(self, transaction=True):
+        if getattr(self._local, "batching", False):
+            # inside _batch: the lock is held and the commit happens once at the end
+            cur = self.conn.cursor()
+            try:
+                yield cur
+            finally:
+                cur.close()
+            return
+        if not transaction and self.readers:
+            if not self.is_setup:
+                with self.lock:
+                    self.setup()
+            with self.readers.cursor() as cur:
+                yield cur
+            return
+        with super().cursor(transaction) as cur:
+            yield cur
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        with self._pending_lock:
+            self._pending.append((config, writes, task_id, task_path))
+        if any(channel.startswith("__") for channel, _ in writes):
+            # errors and interrupts end the run without another put - persist them now
+            self.flush()
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        return self._batch(lambda: DeltaSqliteSaver.put(self, config, checkpoint, metadata, new_versions))
+
+    def get_tuple(self, config):
+        self.flush()
+        return super().get_tuple(config)
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        self.flush()
+        return super().list(config, filter=filter, before=before, limit=limit)
+
+    def flush(self):
+        if self._pending:
+            self._batch(lambda: None)
+
+    def compact(self, thread_id, keep_last=20, snapshot_every=None):
+        """Drop old checkpoints (and their writes) of a thread; returns how many went.
+
+        The newest `keep_last` checkpoints survive, and so does every checkpoint
+        whose step is a multiple of `snapshot_every`, to keep some history to
+        travel back to. Messages stay in the log - the survivors refer to them.
+        """
+        self.flush()
+        with self.cursor() as cur:
+            doomed = cur.execute("""
+                SELECT thread_id, checkpoint_ns, checkpoint_id FROM (
+                    SELECT thread_id, checkpoint_ns, checkpoint_id,
+                           ROW_NUMBER() OVER (PARTITION BY checkpoint_ns ORDER BY checkpoint_id DESC) AS age,
+                           CASE WHEN json_valid(CAST(metadata AS TEXT))
+                                THEN json_extract(CAST(metadata AS TEXT), '$.step') END AS step
+                    FROM checkpoints WHERE thread_id = ?
+                ) WHERE age > ? AND NOT (? > 0 AND step IS NOT NULL AND step % ? = 0)""",
+                (str(thread_id), keep_last, snapshot_every or 0, snapshot_every or 1)).fetchall()
+            self._delete_checkpoints(cur, doomed)
+        return len(doomed)
+
+    def thread_stats(self, thread_id=None):
+        """{thread_id: {checkpoints, writes, messages, *_bytes, total_bytes}} for one thread or all of them."""
+        self.flush()
+        where, args = ("WHERE thread_id = ?", (str(thread_id),)) if thread_id is not None else ("", ())
+        stats = {}
+        with self.cursor(transaction=False) as cur:
+            for table, count_key, size_expr in (
+                    ("checkpoints", "checkpoints", "LENGTH(checkpoint) + COALESCE(LENGTH(metadata), 0)"),
+                    ("writes", "writes", "LENGTH(value)"),
+                    ("message_log", "messages", "LENGTH(value)")):
+                query = f"SELECT thread_id, COUNT(*), COALESCE(SUM({size_expr}), 0) FROM {table} {where} GROUP BY thread_id"
+                for tid, count, size in cur.execute(query, args):
+                    entry = stats.setdefault(tid, {"checkpoints": 0, "checkpoints_bytes": 0, "writes": 0,
+                                                   "writes_bytes": 0, "messages": 0, "messages_bytes": 0})
+                    entry[count_key] = count
+                    entry[f"{count_key}_bytes"] = size
+        for entry in stats.values():
+            entry["total_bytes"] = entry["checkpoints_bytes"] + entry["writes_bytes"] + entry["messages_bytes"]
+        return stats
+
+    @staticmethod
+    def _delete_checkpoints(cur, keys):
+        cur.executemany("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", keys)
+        cur.executemany("DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", keys)
+
+    def _batch(self, final):
+        with self.lock:
+            self.setup()
+            with self._pending_lock:
+                pending, self._pending = self._pending, []
+            self._local.batching = True
+            try:
+                for args in pending:
+                    DeltaSqliteSaver.put_writes(self, *args)
+                result = final()
+                self.conn.commit()
+            except BaseException:
+                self.conn.rollback()
+                self._tails.clear()  # the message log tail may have been rolled back too
+                raise
+            finally:
+                self._local.batching = False
+        return result
+
+
+class RetentionPolicy:
+
+    def __init__(self, keep_last=20, snapshot_every=50, slack=10):
+        self.keep_last = keep_last
+        self.snapshot_every = snapshot_every
+        # let a thread run `slack` checkpoints over keep_last before compacting it again
+        self.slack = slack
+
+    def apply(self, saver, thread_id):
+        return saver.compact(thread_id, keep_last=self.keep_last, snapshot_every=self.snapshot_every)
+
+
+class Compactor:
+    """Background thread applying a RetentionPolicy to every thread_id of a saver."""
+
+    def __init__(self, saver, policy=None, interval=60.0):
+        self.saver = saver
+        self.policy = policy or RetentionPolicy()
+        self.interval = interval
+        self.removed = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="checkpoint-compactor", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def run_once(self):
+        threshold = self.policy.keep_last + self.policy.slack
+        removed = 0
+        for thread_id, entry in self.saver.thread_stats().items():
+            if entry["checkpoints"] > threshold:
+                removed += self.policy.apply(self.saver, thread_id)
+        self.removed += removed
+        return removed
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            started = time.perf_counter()
+            try:
+                removed = self.run_once()
+            except sqlite3.Error as e:
+                print(f"checkpoint compaction failed: {e}")
+                continue
+            if removed:
+                print(f"compacted {removed} checkpoints in {time.perf_counter() - started:.3f}s")
+
+
+@asynccontextmanager
+async def open_async_saver(path):
+    """AsyncSqliteSaver on `path` with the same WAL/synchronous pragmas."""
+    async with aiosqlite.connect(path) as conn:
+        for pragma in PRAGMAS:
+            await conn.execute(pragma)
+        yield AsyncSqliteSaver(conn)
@@ -0,0 +1,108 @@
+"""
+The LangChain side of the offline stand-ins in fake_providers.py.
+
+FakeChatModel is a LangChain chat model (bind_tools, streaming, tool call
+chunks, usage_metadata) replaying the fake_providers transcript in process -
+how ChatGoogleGenerativeAI reaches its endpoint differs between versions, so
+the LangGraph scripts swap the model rather than its URL. fake_search_tool
+stands in for TavilySearch against the stand-in's search.
+"""
+import asyncio
+import json
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.tools import StructuredTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from fake_providers import FakeTavilyClient, Pacing, Transcript, openai_text, split_args, tokens, usage_counts
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model replaying a Transcript, paced like the HTTP stand-in."""
+
+    model: str = "fake-model"
+    transcript: Transcript = None
+    pacing: Pacing = None
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        return cls(transcript=Transcript.from_env(), pacing=Pacing.from_env(), **kwargs)
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _reply(self, messages, tools):
+        roles = {"system": "system", "human": "user", "ai": "assistant", "tool": "tool"}
+        conversation = [(roles.get(m.type, m.type), openai_text(m.content)) for m in messages]
+        schemas = [(t["function"]["name"], t["function"].get("parameters", {})) for t in tools or []]
+        content, tool_calls = (self.transcript or Transcript()).reply(conversation, schemas)
+        prompt, completion = usage_counts(conversation, content, tool_calls)
+        usage = {"input_tokens": prompt, "output_tokens": completion, "total_tokens": prompt + completion}
+        return content, tool_calls, usage
+
+    def _pieces(self, content, tool_calls, usage):
+        """The reply as the AIMessageChunks a streaming provider would send."""
+        pieces = [AIMessageChunk(content=token) for token in (tokens(content) if content else [])]
+        for index, call in enumerate(tool_calls):
+            for n, args in enumerate(split_args(json.dumps(call["args"]))):
+                first = n == 0
+                pieces.append(AIMessageChunk(content="", tool_call_chunks=[{
+                    "name": call["name"] if first else None, "args": args,
+                    "id": call["id"] if first else None, "index": index}]))
+        pieces.append(AIMessageChunk(content="", usage_metadata=usage, response_metadata={"model_name": self.model}))
+        return pieces
+
+    def _result(self, content, tool_calls, usage):
+        message = AIMessage(content=content, tool_calls=tool_calls, usage_metadata=usage,
+                            response_metadata={"model_name": self.model})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, tools=None, **kwargs):
+        content, tool_calls, usage = self._reply(messages, tools)
+        time.sleep((self.pacing or Pacing()).total(usage["output_tokens"]))
+        return self._result(content, tool_calls, usage)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, tools=None, **kwargs):
+        content, tool_calls, usage = self._reply(messages, tools)
+        await asyncio.sleep((self.pacing or Pacing()).total(usage["output_tokens"]))
+        return self._result(content, tool_calls, usage)
+
+    def _stream(self, messages, stop=None, run_manager=None, tools=None, **kwargs):
+        pacing = self.pacing or Pacing()
+        time.sleep(pacing.latency)
+        for piece in self._pieces(*self._reply(messages, tools)):
+            time.sleep(pacing.token_delay())
+            if run_manager and piece.content:
+                run_manager.on_llm_new_token(piece.content)
+            yield ChatGenerationChunk(message=piece)
+
+    async def _astream(self, messages, stop=None, run_manager=None, tools=None, **kwargs):
+        pacing = self.pacing or Pacing()
+        await asyncio.sleep(pacing.latency)
+        for piece in self._pieces(*self._reply(messages, tools)):
+            await asyncio.sleep(pacing.token_delay())
+            if run_manager and piece.content:
+                await run_manager.on_llm_new_token(piece.content)
+            yield ChatGenerationChunk(message=piece)
+
+
+def fake_search_tool(base_url, max_results=4):
+    """Stand-in for TavilySearch: same tool name, so prompts and few-shot examples keep working."""
+    client = FakeTavilyClient(base_url)
+
+    def tavily_search(query: str) -> dict:
+        return client.search(query, max_results=max_results)
+
+    return StructuredTool.from_function(
+        func=tavily_search, name="tavily_search",
+        description="A search engine optimized for comprehensive, accurate, and trusted results. "
+                    "Input should be a search query.")
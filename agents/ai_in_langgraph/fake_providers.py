@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+Offline stand-ins for every service the agents in this directory talk to.
+
+Without Gemini, Tavily, DDG, Nominatim and open-meteo none of the scripts run,
+so their speed cannot be measured (or compared between commits) on a plain box.
+This module replays a recorded transcript instead, deterministically, paced by
+a configurable time to first token and token rate:
+
+- serve() starts a local HTTP server speaking just enough of
+    OpenAI    POST /v1/chat/completions                 (stream and non-stream)
+    Gemini    POST /v1beta/models/<model>:generateContent / :streamGenerateContent?alt=sse
+    Tavily    POST /search
+    Nominatim GET  /search?q=...&format=json
+    open-meteo GET /v1/forecast
+    web pages GET  /page/<n>
+- FakeTavilyClient and FakeDDGS query the server's search;
+- the LangChain side - FakeChatModel and fake_search_tool - lives in
+  fake_chat_model.py, so the scripts that do not use LangChain never import it.
+
+Scripts 01-07 switch to all of this when FAKE_PROVIDERS is set: "1" starts a
+server inside the process, a URL uses one started separately with
+`python fake_providers.py --port 8765`. Pacing comes from FAKE_LATENCY
+(seconds to the first token, default 0.2), FAKE_TOKENS_PER_SECOND (default 50,
+0 for no delay) and FAKE_TOOL_LATENCY (search/weather round trip, default
+0.3); FAKE_TRANSCRIPT points to a JSON file replacing DEFAULT_TRANSCRIPT.
+
+A transcript has a "react" script, used when the system prompt asks for
+Thought/Action/PAUSE text (01_agent_from_scratch.py), and a "tools" script for
+tool calling models. Turn n of a script answers a question followed by n tool
+results; "{question}", "{observation}" and "{today}" are filled in, a tool
+call named "*" goes to the first tool bound, and arguments the bound tool
+does not take are dropped.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+DEFAULT_TRANSCRIPT = {
+    "react": [
+        "Thought: I need the weight of a Border Collie.\nAction: average_dog_weight: Border Collie\nPAUSE",
+        "Thought: Now the Scottish Terrier.\nAction: average_dog_weight: Scottish Terrier\nPAUSE",
+        "Thought: I can add the two weights.\nAction: calculate: 37 + 20\nPAUSE",
+        "Answer: The combined weight of a border collie and a scottish terrier is 57 lbs.",
+    ],
+    "tools": [
+        {"content": "", "tool_calls": [{"name": "*", "args": {
+            "query": "{question}", "location": "San Francisco", "date": "{today}",
+            "queries": [{"location": "San Francisco", "date": "{today}"}]}}]},
+        {"content": "Here is what I found: {observation} In short, the search answers the question."},
+    ],
+}
+TOKEN = re.compile(r"\s*\S+")
+
+
+def count_tokens(text):
+    # the ~4 characters per token rule of thumb, same as rate_limiter.estimate_tokens
+    return max(1, len(text) // 4)
+
+
+class Pacing:
+
+    def __init__(self, latency=0.2, tokens_per_second=50.0, tool_latency=0.3):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.tool_latency = tool_latency
+
+    @classmethod
+    def from_env(cls):
+        return cls(float(os.getenv("FAKE_LATENCY", 0.2)), float(os.getenv("FAKE_TOKENS_PER_SECOND", 50)),
+                   float(os.getenv("FAKE_TOOL_LATENCY", 0.3)))
+
+    def token_delay(self):
+        return 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def total(self, n_tokens):
+        return self.latency + n_tokens * self.token_delay()
+
+
+class Transcript:
+
+    def __init__(self, scripts=None):
+        self.scripts = scripts or DEFAULT_TRANSCRIPT
+
+    @classmethod
+    def from_env(cls):
+        path = os.getenv("FAKE_TRANSCRIPT")
+        if not path:
+            return cls()
+        with open(path) as infile:
+            return cls(json.load(infile))
+
+    def reply(self, conversation, tools=()):
+        """(content, tool_calls) for [(role, text), ...]; tools: [(name, JSON schema of the arguments), ...]."""
+        question, observations, react = "", [], False
+        for role, text in conversation:
+            if role == "system":
+                react = react or "PAUSE" in text
+            elif role == "tool" or (role == "user" and text.lstrip().startswith("Observation")):
+                observations.append(text)
+            elif role == "user":
+                question, observations = text, []
+        script = self.scripts["react" if react else "tools"]
+        index = min(len(observations), len(script) - 1)
+        # an unbound model (07's answer phase) cannot call tools: skip ahead to the answer
+        while not tools and index < len(script) - 1 and self._turn(script[index]).get("tool_calls"):
+            index += 1
+        turn = self._turn(script[index])
+        fields = {"question": " ".join(question.split())[:200], "today": date.today().isoformat(),
+                  "observation": " ".join((observations[-1] if observations else "").split())[:200]}
+        content = fill(turn.get("content", ""), fields)
+        tool_calls = [self._tool_call(spec, tools, fields) for spec in turn.get("tool_calls", [])] if tools else []
+        return content, tool_calls
+
+    @staticmethod
+    def _turn(turn):
+        return {"content": turn} if isinstance(turn, str) else turn
+
+    @staticmethod
+    def _tool_call(spec, tools, fields):
+        schemas = dict(tools)
+        name = spec["name"] if spec["name"] in schemas else tools[0][0]
+        properties = schemas[name].get("properties")
+        args = {k: fill(v, fields) for k, v in spec.get("args", {}).items()
+                if properties is None or k in properties}
+        return {"name": name, "args": args, "id": f"call_{uuid.uuid4().hex[:12]}"}
+
+
+def fill(value, fields):
+    if isinstance(value, str):
+        for key, text in fields.items():
+            value = value.replace("{" + key + "}", text)
+        return value
+    if isinstance(value, list):
+        return [fill(v, fields) for v in value]
+    if isinstance(value, dict):
+        return {k: fill(v, fields) for k, v in value.items()}
+    return value
+
+
+def tokens(text):
+    return TOKEN.findall(text) or [text]
+
+
+def split_args(arguments, pieces=4):
+    """A tool call's JSON arguments in a few pieces, the way providers stream them."""
+    size = max(1, -(-len(arguments) // pieces))
+    return [arguments[i:i + size] for i in range(0, len(arguments), size)] or [""]
+
+
+# ---------------------------------------------------------------- HTTP stand-in
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+    transcript = Transcript()
+    pacing = Pacing()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if path.endswith("/chat/completions"):
+            self.openai_chat(body)
+        elif ":generateContent" in path or ":streamGenerateContent" in path:
+            self.gemini_generate(body, path.rsplit("/", 1)[-1].split(":")[0], ":stream" in path)
+        elif path == "/search":
+            time.sleep(self.pacing.tool_latency)
+            self.send_json(tavily_results(self.base_url(), body.get("query", ""), body.get("max_results", 5)))
+        else:
+            self.send_error(404)
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        if parts.path == "/search":
+            time.sleep(self.pacing.tool_latency)
+            self.send_json(nominatim_results(query.get("q", "")))
+        elif parts.path == "/v1/forecast":
+            time.sleep(self.pacing.tool_latency)
+            self.send_json(open_meteo_forecast(query))
+        elif parts.path.startswith("/page/"):
+            self.send_body(page_html(parts.path.rsplit("/", 1)[-1]).encode(), "text/html; charset=utf-8")
+        else:
+            self.send_error(404)
+
+    def base_url(self):
+        return f"http://{self.headers.get('Host')}"
+
+    # OpenAI chat completions ---------------------------------------------------
+
+    def openai_chat(self, body):
+        conversation = [(m["role"], openai_text(m.get("content"))) for m in body.get("messages", [])]
+        tools = [(t["function"]["name"], t["function"].get("parameters", {})) for t in body.get("tools") or []]
+        content, tool_calls = self.transcript.reply(conversation, tools)
+        model = body.get("model", "fake-model")
+        usage = usage_counts(conversation, content, tool_calls)
+        openai_usage = {"prompt_tokens": usage[0], "completion_tokens": usage[1], "total_tokens": sum(usage)}
+        finish = "tool_calls" if tool_calls else "stop"
+        calls = [{"id": t["id"], "type": "function",
+                  "function": {"name": t["name"], "arguments": json.dumps(t["args"])}} for t in tool_calls]
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex}", "created": int(time.time()), "model": model}
+        if not body.get("stream"):
+            time.sleep(self.pacing.total(usage[1]))
+            message = {"role": "assistant", "content": content or None}
+            if calls:
+                message["tool_calls"] = calls
+            self.send_json({**base, "object": "chat.completion", "usage": openai_usage,
+                            "choices": [{"index": 0, "message": message, "finish_reason": finish}]})
+            return
+
+        def chunk(delta, finish_reason=None, **extra):
+            return {**base, "object": "chat.completion.chunk", **extra,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+
+        self.start_sse()
+        time.sleep(self.pacing.latency)
+        self.send_event(chunk({"role": "assistant", "content": ""}))
+        for token in tokens(content) if content else []:
+            time.sleep(self.pacing.token_delay())
+            self.send_event(chunk({"content": token}))
+        for index, call in enumerate(calls):
+            for n, piece in enumerate(split_args(call["function"]["arguments"])):
+                time.sleep(self.pacing.token_delay())
+                delta = {"index": index, "function": {"arguments": piece}}
+                if n == 0:
+                    delta.update(id=call["id"], type="function")
+                    delta["function"]["name"] = call["function"]["name"]
+                self.send_event(chunk({"tool_calls": [delta]}))
+        self.send_event(chunk({}, finish, usage=openai_usage))
+        self.send_event("[DONE]")
+        self.end_sse()
+
+    # Gemini generateContent ---------------------------------------------------
+
+    def gemini_generate(self, body, model, stream):
+        conversation = []
+        instruction = body.get("systemInstruction") or body.get("system_instruction")
+        if instruction:
+            conversation.append(("system", " ".join(p.get("text", "") for p in instruction.get("parts", []))))
+        for content in body.get("contents", []):
+            for part in content.get("parts", []):
+                if "functionResponse" in part or "function_response" in part:
+                    response = part.get("functionResponse") or part.get("function_response")
+                    conversation.append(("tool", json.dumps(response.get("response"))))
+                elif "text" in part:
+                    conversation.append(("assistant" if content.get("role") == "model" else "user", part["text"]))
+        tools = [(f["name"], f.get("parameters", {}))
+                 for t in body.get("tools") or []
+                 for f in t.get("functionDeclarations") or t.get("function_declarations") or []]
+        content, tool_calls = self.transcript.reply(conversation, tools)
+        usage = usage_counts(conversation, content, tool_calls)
+        metadata = {"promptTokenCount": usage[0], "candidatesTokenCount": usage[1], "totalTokenCount": sum(usage)}
+
+        def response(parts, finish=None):
+            candidate = {"content": {"role": "model", "parts": parts}, "index": 0}
+            if finish:
+                candidate["finishReason"] = finish
+            return {"candidates": [candidate], "usageMetadata": metadata, "modelVersion": model}
+
+        calls = [{"functionCall": {"name": t["name"], "args": t["args"]}} for t in tool_calls]
+        if not stream:
+            time.sleep(self.pacing.total(usage[1]))
+            self.send_json(response(([{"text": content}] if content else []) + calls, "STOP"))
+            return
+        self.start_sse()
+        time.sleep(self.pacing.latency)
+        pieces = tokens(content) if content else []
+        for n, token in enumerate(pieces):
+            time.sleep(self.pacing.token_delay())
+            last = n == len(pieces) - 1 and not calls
+            self.send_event(response([{"text": token}], "STOP" if last else None))
+        if calls:
+            # Gemini sends function calls whole, never in pieces
+            self.send_event(response(calls, "STOP"))
+        self.end_sse()
+
+    # plumbing -------------------------------------------------------------------
+
+    def send_json(self, payload):
+        self.send_body(json.dumps(payload).encode(), "application/json")
+
+    def send_body(self, data, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def start_sse(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def send_event(self, payload):
+        data = payload if isinstance(payload, str) else json.dumps(payload)
+        self.write_chunk(f"data: {data}\n\n".encode())
+
+    def end_sse(self):
+        self.wfile.write(b"0\r\n\r\n")
+
+    def write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+def openai_text(content):
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def usage_counts(conversation, content, tool_calls):
+    prompt = sum(count_tokens(text) for _, text in conversation)
+    completion = count_tokens(content + "".join(json.dumps(t["args"]) for t in tool_calls))
+    return prompt, completion
+
+
+def stable_number(text, modulo):
+    return int(hashlib.md5(text.encode()).hexdigest(), 16) % modulo
+
+
+def tavily_results(base_url, query, max_results=5):
+    results = [{"title": f"Result {n} for {query.strip()[:60]}", "url": f"{base_url}/page/{stable_number(query, 1000) + n}",
+                "content": f"Page {n} says: {' '.join(query.split())[:120]} - answered in detail on this page.",
+                "score": round(0.9 - n / 20, 3), "raw_content": None}
+               for n in range(max_results)]
+    return {"query": query, "answer": None, "images": [], "follow_up_questions": None,
+            "results": results, "response_time": 0.0}
+
+
+def nominatim_results(query):
+    if not query.strip():
+        return []
+    return [{"place_id": stable_number(query, 10 ** 6), "display_name": query.title(),
+             "lat": f"{stable_number(query, 18000) / 100 - 90:.4f}",
+             "lon": f"{stable_number(query[::-1], 36000) / 100 - 180:.4f}"}]
+
+
+def open_meteo_forecast(query):
+    start = date.fromisoformat(query.get("start_date", date.today().isoformat()))
+    end = date.fromisoformat(query.get("end_date", start.isoformat()))
+    days = [start + timedelta(days=n) for n in range((end - start).days + 1)]
+    times = [f"{day.isoformat()}T{hour:02d}:00" for day in days for hour in range(24)]
+    points = []
+    for latitude, longitude in zip(query.get("latitude", "0").split(","), query.get("longitude", "0").split(",")):
+        base = 25 - abs(float(latitude)) / 4
+        temperatures = [round(base + 6 * ((int(t[11:13]) - 4) % 24 < 12) - 3, 1) for t in times]
+        points.append({"latitude": float(latitude), "longitude": float(longitude),
+                       "hourly": {"time": times, "temperature_2m": temperatures}})
+    return points[0] if len(points) == 1 else points
+
+
+def page_html(name, paragraphs=40):
+    body = "".join(f"<p>Paragraph {n} of page {name}: the fake web has little to say, but says it at length.</p>"
+                   for n in range(paragraphs))
+    return (f"<html><head><title>Page {name}</title><style>p {{ margin: 0 }}</style>"
+            f"<script>var tracking = {name};</script></head><body><h1>Page {name}</h1>{body}</body></html>")
+
+
+def serve(host="127.0.0.1", port=0, transcript=None, pacing=None):
+    """Start the stand-in on a daemon thread; returns (server, base URL)."""
+    handler = type("Handler", (FakeProviderHandler,), {"transcript": transcript or Transcript.from_env(),
+                                                       "pacing": pacing or Pacing.from_env()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-providers", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+_server_lock = threading.Lock()
+_server_url = None
+
+
+def fake_url():
+    """Base URL of the stand-in when FAKE_PROVIDERS is set (starting one in process for "1"), else None."""
+    global _server_url
+    setting = os.getenv("FAKE_PROVIDERS")
+    if not setting:
+        return None
+    if setting.startswith("http"):
+        return setting.rstrip("/")
+    with _server_lock:
+        if _server_url is None:
+            _, _server_url = serve()
+        return _server_url
+
+
+class FakeTavilyClient:
+    """The TavilyClient.search the scripts use, against the stand-in."""
+
+    def __init__(self, base_url, session=None):
+        self.base_url = base_url
+        self.session = session or requests.Session()
+
+    def search(self, query, max_results=5, **kwargs):
+        response = self.session.post(f"{self.base_url}/search", json={"query": query, "max_results": max_results},
+                                     timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+
+class FakeDDGS(FakeTavilyClient):
+    """DDGS().text with result pages served by the stand-in."""
+
+    def text(self, query, max_results=5, **kwargs):
+        return [{"title": r["title"], "href": r["url"], "body": r["content"]}
+                for r in self.search(query, max_results)["results"]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline stand-in for the LLM, search and weather APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    server, url = serve(args.host, args.port)
+    print(f"fake providers at {url} - run the scripts with FAKE_PROVIDERS={url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
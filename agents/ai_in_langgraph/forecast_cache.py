@@ -0,0 +1,96 @@
+"""
+In-memory cache of open-meteo hourly forecasts, keyed by grid cell and date.
+
+Weather questions repeat (SF, LA and NY for today), and coordinates closer than
+the forecast model's grid get the same answer anyway, so a forecast is cached
+per (lat/lon rounded to `resolution` degrees, date). A day is kept in columnar
+form - the epoch seconds and the temperatures in two parallel arrays - instead
+of a {time string: float} dict, a few hundred bytes instead of a few kilobytes.
+
+Forecasts go stale when the weather models publish a new run, so an entry
+expires at the next `update_hours` boundary (UTC); days already in the past
+do not change and only leave the cache when it is full.
+"""
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from datetime import date as Date, datetime, timezone
+
+TIME_FORMAT = "%Y-%m-%dT%H:%M"  # as open-meteo returns it
+
+
+class DayForecast:
+
+    __slots__ = ("times", "temperatures", "expires")
+
+    def __init__(self, times, temperatures, expires):
+        self.times = array("q", times)
+        self.temperatures = array("f", (float("nan") if t is None else t for t in temperatures))
+        self.expires = expires
+
+    @classmethod
+    def from_open_meteo(cls, times, temperatures, expires):
+        return cls((int(datetime.strptime(t, TIME_FORMAT).replace(tzinfo=timezone.utc).timestamp()) for t in times),
+                   temperatures, expires)
+
+    def as_dict(self):
+        """The {"2025-08-08T13:00": 21.4, ...} mapping get_weather_forecast has always returned."""
+        return {datetime.fromtimestamp(t, timezone.utc).strftime(TIME_FORMAT): None if temp != temp else round(temp, 1)
+                for t, temp in zip(self.times, self.temperatures)}
+
+    def nbytes(self):
+        return self.times.itemsize * len(self.times) + self.temperatures.itemsize * len(self.temperatures)
+
+
+class ForecastCache:
+
+    def __init__(self, resolution=0.1, update_hours=3, max_entries=10_000):
+        self.resolution = resolution
+        self.update_seconds = update_hours * 3600
+        self.max_entries = max_entries
+        self._days = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def cell(self, latitude, longitude):
+        return round(latitude / self.resolution), round(longitude / self.resolution)
+
+    def center(self, cell):
+        # ask open-meteo about the cell center, so every point of the cell shares one cached answer
+        return round(cell[0] * self.resolution, 4), round(cell[1] * self.resolution, 4)
+
+    def get(self, cell, date, count=True):
+        with self._lock:
+            day = self._days.get((cell, date))
+            if day is None or day.expires < time.time():
+                self.misses += count
+                return None
+            self._days.move_to_end((cell, date))
+            self.hits += count
+            return day
+
+    def put(self, cell, times, temperatures):
+        """Store an open-meteo hourly series for a cell, split into days."""
+        by_date = {}
+        for t, temp in zip(times, temperatures):
+            day_times, day_temps = by_date.setdefault(t[:10], ([], []))
+            day_times.append(t)
+            day_temps.append(temp)
+        with self._lock:
+            for date, (day_times, day_temps) in by_date.items():
+                self._days[(cell, date)] = DayForecast.from_open_meteo(day_times, day_temps, self.expiry(date))
+                self._days.move_to_end((cell, date))
+            while len(self._days) > self.max_entries:
+                self._days.popitem(last=False)
+
+    def expiry(self, date):
+        now = time.time()
+        if Date.fromisoformat(date) < datetime.now(timezone.utc).date():
+            return float("inf")
+        return (now // self.update_seconds + 1) * self.update_seconds
+
+    def nbytes(self):
+        with self._lock:
+            return sum(day.nbytes() for day in self._days.values())
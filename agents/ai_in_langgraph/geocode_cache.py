@@ -0,0 +1,163 @@
+"""
+Local geocoding for the weather tool.
+
+Every get_weather_forecast call used to ask Nominatim where "San Francisco" is,
+over the network and under its 1 request/s policy. Geocoder answers in order
+from
+
+1. a persistent SQLite cache of normalized location string -> lat/lon (with TTL),
+2. an optional offline gazetteer built from a GeoNames dump
+   (https://download.geonames.org/export/dump/, e.g. cities15000.txt): names
+   and alternate names in one sorted list, coordinates and population in
+   parallel arrays, looked up by binary search - exact, then prefix, then fuzzy,
+3. the remote geocoder, whose answers then land in the cache - a miss for a
+   day only (`negative_ttl`), a failed call (timeout, outage) not at all.
+"""
+import difflib
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+from pathlib import Path
+
+Place = namedtuple("Place", "latitude longitude address")
+
+DEFAULT_CACHE_PATH = os.getenv("GEOCODE_CACHE_PATH", str(Path.home() / ".cache" / "llms" / "geocode.sqlite"))
+
+
+def normalize(location):
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s,]", "", location.lower())).strip(" ,")
+
+
+class GeocodeCache:
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=90 * 24 * 3600, negative_ttl=24 * 3600):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS geocodes (
+                query     TEXT PRIMARY KEY,
+                latitude  REAL,
+                longitude REAL,
+                address   TEXT,
+                created   REAL NOT NULL
+            )""")
+
+    def get(self, query):
+        """A Place, None for an unknown query, or False for a location known not to exist."""
+        with self._lock:
+            row = self._conn.execute("SELECT latitude, longitude, address, created FROM geocodes WHERE query = ?",
+                                     (query,)).fetchone()
+        if row is None or time.time() - row[3] > (self.ttl if row[0] is not None else self.negative_ttl):
+            return None
+        if row[0] is None:
+            return False
+        return Place(*row[:3])
+
+    def put(self, query, place):
+        # misses are remembered too, so a typo does not hit Nominatim every time
+        values = (place.latitude, place.longitude, place.address) if place else (None, None, None)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?, ?, ?)", (query, *values, time.time()))
+
+
+class Gazetteer:
+
+    def __init__(self, keys, refs, names, latitudes, longitudes, populations):
+        self.keys = keys                # sorted normalized names, alternate names included
+        self.refs = refs                # array: keys[i] belongs to place refs[i]
+        self.names = names
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.populations = populations
+
+    @classmethod
+    def load(cls, path, min_population=0, alternate_names=True):
+        """Build the index from a GeoNames dump (tab separated, one place per line)."""
+        names, latitudes, longitudes, populations = [], array("d"), array("d"), array("q")
+        entries = []
+        with open(path, encoding="utf-8") as dump:
+            for line in dump:
+                fields = line.rstrip("\n").split("\t")
+                population = int(fields[14] or 0)
+                if population < min_population:
+                    continue
+                ref = len(names)
+                names.append(fields[1])
+                latitudes.append(float(fields[4]))
+                longitudes.append(float(fields[5]))
+                populations.append(population)
+                aliases = {fields[1], fields[2]}
+                if alternate_names and fields[3]:
+                    aliases.update(fields[3].split(","))
+                entries.extend((normalize(alias), ref) for alias in aliases if alias)
+        entries.sort()
+        return cls([k for k, _ in entries], array("l", (r for _, r in entries)),
+                   names, latitudes, longitudes, populations)
+
+    def lookup(self, query, fuzzy=True):
+        query = normalize(query)
+        if not query:
+            return None
+        # exact, then prefix - among equally good matches the most populous place wins
+        for upper in (query + "\0", query + "\uffff"):
+            lo, hi = bisect_left(self.keys, query), bisect_left(self.keys, upper)
+            if lo < hi:
+                return self._place(max(self.refs[lo:hi], key=self.populations.__getitem__))
+        if fuzzy:
+            lo, hi = bisect_left(self.keys, query[:2]), bisect_left(self.keys, query[:2] + "\uffff")
+            close = difflib.get_close_matches(query, self.keys[lo:hi], n=1, cutoff=0.85)
+            if close:
+                return self.lookup(close[0], fuzzy=False)
+        return None
+
+    def _place(self, ref):
+        return Place(self.latitudes[ref], self.longitudes[ref], self.names[ref])
+
+
+class Geocoder:
+
+    def __init__(self, remote=None, cache=None, gazetteer=None):
+        # remote: callable location -> geopy Location or None, e.g. a rate limited Nominatim.geocode;
+        # it has to raise when the lookup fails (RateLimiter(..., swallow_exceptions=False)), or an
+        # outage would be cached as "no such place"
+        self.remote = remote
+        self.cache = cache if cache is not None else GeocodeCache()
+        self.gazetteer = gazetteer
+        self.hits = {"cache": 0, "gazetteer": 0, "remote": 0}
+        self._lock = threading.Lock()  # get_forecasts geocodes from a thread pool
+
+    def geocode(self, location):
+        query = normalize(location)
+        place = self.cache.get(query)
+        if place is not None:
+            self._count("cache")
+            return place or None
+        if self.gazetteer is not None:
+            # "San Francisco, CA" -> try the whole string, then just the city
+            for candidate in dict.fromkeys((query, query.split(",")[0])):
+                place = self.gazetteer.lookup(candidate)
+                if place:
+                    self._count("gazetteer")
+                    self.cache.put(query, place)
+                    return place
+        if self.remote is None:
+            return None
+        found = self.remote(location)  # raises on failure: nothing is cached then
+        self._count("remote")
+        place = Place(found.latitude, found.longitude, found.address) if found else None
+        self.cache.put(query, place)
+        return place
+
+    def _count(self, source):
+        with self._lock:
+            self.hits[source] += 1
@@ -0,0 +1,208 @@
+"""
+Response cache in front of Agent.call_openai.
+
+The key is a digest of the normalized message list the model is about to see:
+message type, whitespace-normalized content and tool calls (name + args). Tool
+call ids are left out - Gemini makes up fresh ones on every run - so a repeated
+"What is the weather in sf?" conversation, tool results included, maps to the
+same entry and skips the model round trip.
+
+Replaying a cached AIMessage hands out new ids for the message and its
+tool_calls, so the ToolMessages of this run never collide with those of the
+run that filled the cache.
+
+With an `embed` function (text -> list of floats) the cache also does a
+similarity lookup over the conversation text. That is only ever used for final
+answers: similar questions ("weather in sf" vs "weather in la") need different
+tool args, so a response with tool_calls is reused on exact match only.
+"""
+import hashlib
+import json
+import math
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+
+# not LLM_CACHE_PATH: that one is basics/gemini's ResponseCache, a different file format
+DEFAULT_PATH = os.getenv("LANGGRAPH_LLM_CACHE_PATH",
+                         str(Path.home() / ".cache" / "llms" / "langgraph_responses.sqlite"))
+
+
+class LLMResponseCache:
+
+    def __init__(self, namespace="", store=None, max_entries=1024, embed=None, similarity=0.97):
+        # store: a mapping digest -> AIMessage (get / [key] = / len), e.g. MessageStore for a persistent cache
+        self.namespace = namespace
+        self.store = OrderedDict() if store is None else store
+        self.max_entries = max_entries
+        self.embed = embed
+        self.similarity = similarity
+        self._vectors = []  # (vector, digest) for final answers only
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def persistent(cls, namespace="", path=DEFAULT_PATH, **kwargs):
+        """A cache kept in SQLite at `path`, so a script run twice gets its hits; close() it when done."""
+        max_entries = kwargs.pop("max_entries", 1024)
+        store = MessageStore(path, max_entries=max_entries, ttl=kwargs.pop("ttl", 30 * 24 * 3600))
+        return cls(namespace, store=store, max_entries=max_entries, **kwargs)
+
+    def close(self):
+        with self._lock:
+            if hasattr(self.store, "close"):
+                self.store.close()
+
+    def invoke(self, model, messages):
+        message = self.lookup(messages)
+        if message is None:
+            message = model.invoke(messages)
+            self.save(messages, message)
+        return message
+
+    async def ainvoke(self, model, messages):
+        message = self.lookup(messages)
+        if message is None:
+            message = await model.ainvoke(messages)
+            self.save(messages, message)
+        return message
+
+    def digest(self, messages):
+        payload = json.dumps([self.namespace] + [normalize(m) for m in messages],
+                             sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def lookup(self, messages):
+        key = self.digest(messages)
+        with self._lock:
+            cached = self.store.get(key)
+            if cached is not None:
+                if isinstance(self.store, OrderedDict):
+                    self.store.move_to_end(key)
+                self.hits += 1
+                return replay(cached)
+        if self.embed is not None:
+            cached = self._similar(messages)
+            if cached is not None:
+                with self._lock:
+                    self.semantic_hits += 1
+                return replay(cached)
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def save(self, messages, message):
+        if getattr(message, "invalid_tool_calls", None):
+            return  # a garbled tool call is worth retrying, not remembering
+        key = self.digest(messages)
+        vector = None
+        if self.embed is not None and not message.tool_calls:
+            vector = self.embed(conversation_text(messages))
+        with self._lock:
+            self.store[key] = message
+            if vector is not None:
+                self._vectors.append((vector, key))
+            if isinstance(self.store, OrderedDict):
+                while len(self.store) > self.max_entries:
+                    evicted, _ = self.store.popitem(last=False)
+                    self._vectors = [(v, k) for v, k in self._vectors if k != evicted]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.semantic_hits + self.misses
+            return {
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.semantic_hits) / lookups if lookups else 0.0,
+                "entries": len(self.store),
+            }
+
+    def _similar(self, messages):
+        vector = self.embed(conversation_text(messages))
+        best, best_key = self.similarity, None
+        with self._lock:
+            for candidate, key in self._vectors:
+                score = cosine(vector, candidate)
+                if score >= best:
+                    best, best_key = score, key
+            return self.store.get(best_key) if best_key else None
+
+
+class MessageStore:
+    """AIMessages in SQLite by digest; entries expire after `ttl`, the least recently used go beyond `max_entries`."""
+
+    def __init__(self, path=DEFAULT_PATH, max_entries=1024, ttl=30 * 24 * 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # LLMResponseCache serializes all access with its own lock
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                key      TEXT PRIMARY KEY,
+                message  BLOB NOT NULL,
+                created  REAL NOT NULL,
+                accessed REAL NOT NULL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS messages_accessed ON messages(accessed)")
+
+    def get(self, key, default=None):
+        now = time.time()
+        row = self._conn.execute("SELECT message, created FROM messages WHERE key = ?", (key,)).fetchone()
+        if row is None or now - row[1] > self.ttl:
+            return default
+        self._conn.execute("UPDATE messages SET accessed = ? WHERE key = ?", (now, key))
+        return pickle.loads(row[0])
+
+    def __setitem__(self, key, message):
+        now = time.time()
+        self._conn.execute("INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?)",
+                           (key, pickle.dumps(message), now, now))
+        self._conn.execute("DELETE FROM messages WHERE created < ?", (now - self.ttl,))
+        self._conn.execute("DELETE FROM messages WHERE key IN (SELECT key FROM messages ORDER BY accessed DESC "
+                           "LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+def normalize(message):
+    content = message.content
+    if isinstance(content, str):
+        content = " ".join(content.split())
+    entry = {"type": message.type, "content": content}
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        entry["tool_calls"] = [{"name": t["name"], "args": t["args"]} for t in tool_calls]
+    return entry
+
+
+def replay(message):
+    # fresh ids, so replayed tool calls pair up with this run's ToolMessages only
+    update = {"id": f"cached-{uuid.uuid4()}"}
+    if message.tool_calls:
+        update["tool_calls"] = [{**t, "id": f"call_{uuid.uuid4().hex[:24]}"} for t in message.tool_calls]
+    return message.model_copy(update=update, deep=True)
+
+
+def conversation_text(messages):
+    return "\n".join(f"{m.type}: {m.content}" for m in messages if isinstance(m.content, str))
+
+
+def cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
@@ -0,0 +1,124 @@
+"""
+Delta checkpoints for the messages channel.
+
+AgentState.messages only ever grows (operator.add), yet SqliteSaver re-serializes
+the whole list into every checkpoint, so each hop of a long thread costs O(n)
+in serialization and storage. DeltaSqliteSaver keeps the messages of a thread
+in an append-only `message_log` table, writes only the messages that are new
+since the previous checkpoint, and stores a small {"__message_log__": n}
+reference in the checkpoint instead of the list. Reading a checkpoint back
+resolves the reference to the first n logged messages.
+
+If a thread's history stops being a pure extension of what is logged (a fork
+from an earlier checkpoint, update_state rewriting messages) that checkpoint
+keeps its messages inline - slower, but never wrong.
+"""
+import sqlite3
+from contextlib import closing, contextmanager
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+LOG_MARKER = "__message_log__"
+
+
+class DeltaSqliteSaver(SqliteSaver):
+
+    channel = "messages"
+
+    def __init__(self, conn, *, serde=None):
+        super().__init__(conn, serde=serde)
+        # (thread_id, checkpoint_ns) -> (number of logged messages, blob of the last one)
+        self._tails = {}
+
+    @classmethod
+    @contextmanager
+    def from_conn_string(cls, conn_string):
+        with closing(sqlite3.connect(conn_string, check_same_thread=False)) as conn:
+            yield cls(conn)
+
+    def setup(self):
+        if self.is_setup:
+            return
+        super().setup()
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS message_log (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                idx INTEGER NOT NULL,
+                type TEXT,
+                value BLOB,
+                PRIMARY KEY (thread_id, checkpoint_ns, idx)
+            );
+        """)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        messages = checkpoint["channel_values"].get(self.channel)
+        if isinstance(messages, list) and messages:
+            thread_id = config["configurable"]["thread_id"]
+            checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+            if self._append(thread_id, checkpoint_ns, messages):
+                channel_values = {**checkpoint["channel_values"], self.channel: {LOG_MARKER: len(messages)}}
+                checkpoint = {**checkpoint, "channel_values": channel_values}
+        return super().put(config, checkpoint, metadata, new_versions)
+
+    def get_tuple(self, config):
+        return self._expand(super().get_tuple(config))
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        # drain first: the parent generator holds the connection lock while it yields
+        saved = [*super().list(config, filter=filter, before=before, limit=limit)]
+        for checkpoint_tuple in saved:
+            yield self._expand(checkpoint_tuple)
+
+    def delete_thread(self, thread_id):
+        super().delete_thread(thread_id)
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM message_log WHERE thread_id = ?", (str(thread_id),))
+        self._tails = {k: v for k, v in self._tails.items() if k[0] != str(thread_id)}
+
+    def _append(self, thread_id, checkpoint_ns, messages):
+        """Log the messages not logged yet; False if `messages` does not extend the log."""
+        key = (str(thread_id), checkpoint_ns)
+        with self.cursor() as cur:
+            if key not in self._tails:
+                row = cur.execute(
+                    "SELECT idx, value FROM message_log WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY idx DESC LIMIT 1", key).fetchone()
+                self._tails[key] = (row[0] + 1, row[1]) if row else (0, None)
+            logged, last_blob = self._tails[key]
+            if len(messages) < logged:
+                # an older prefix - fine if it matches what we logged at that position
+                return self._matches(cur, key, len(messages) - 1, messages[-1])
+            if logged and self.serde.dumps_typed(messages[logged - 1])[1] != last_blob:
+                return False
+            new_rows = []
+            for idx in range(logged, len(messages)):
+                type_, blob = self.serde.dumps_typed(messages[idx])
+                new_rows.append((*key, idx, type_, blob))
+            if new_rows:
+                cur.executemany("INSERT OR REPLACE INTO message_log VALUES (?, ?, ?, ?, ?)", new_rows)
+                self._tails[key] = (len(messages), new_rows[-1][-1])
+        return True
+
+    def _matches(self, cur, key, idx, message):
+        row = cur.execute("SELECT value FROM message_log WHERE thread_id = ? AND checkpoint_ns = ? AND idx = ?",
+                          (*key, idx)).fetchone()
+        return row is not None and row[0] == self.serde.dumps_typed(message)[1]
+
+    def _expand(self, checkpoint_tuple):
+        if checkpoint_tuple is None:
+            return None
+        channel_values = checkpoint_tuple.checkpoint["channel_values"]
+        ref = channel_values.get(self.channel)
+        if isinstance(ref, dict) and LOG_MARKER in ref:
+            configurable = checkpoint_tuple.config["configurable"]
+            channel_values[self.channel] = self._load(
+                configurable["thread_id"], configurable.get("checkpoint_ns", ""), ref[LOG_MARKER])
+        return checkpoint_tuple
+
+    def _load(self, thread_id, checkpoint_ns, count):
+        with self.cursor(transaction=False) as cur:
+            rows = cur.execute(
+                "SELECT type, value FROM message_log WHERE thread_id = ? AND checkpoint_ns = ? AND idx < ? "
+                "ORDER BY idx", (str(thread_id), checkpoint_ns, count)).fetchall()
+        return [self.serde.loads_typed((type_, blob)) for type_, blob in rows]
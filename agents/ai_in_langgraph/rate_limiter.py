@@ -0,0 +1,264 @@
+"""
+Client-side rate limiting for Gemini / OpenAI calls.
+
+The free tier (https://ai.google.dev/gemini-api/docs/rate-limits#free-tier)
+caps every model at some requests per minute and tokens per minute. Sending
+bursts and letting the SDK retry the 429s wastes the retries and leaves
+throughput oscillating; instead every call first acquires from two token
+buckets of its model - one request, and an estimate of its tokens - and
+callers are served strictly first come, first served. Once the response is
+back the estimate is settled against the reported usage.
+
+Wrappers cover the three kinds of call sites in this repo: the OpenAI client
+(Gemini's OpenAI-compatible endpoint), genai.Client, and LangChain chat
+models (RateLimitScheduler.invoke / ainvoke / astream).
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+
+# (requests per minute, tokens per minute), free tier
+DEFAULT_QUOTAS = {
+    "gemini-2.5-pro": (5, 250_000),
+    "gemini-2.5-flash": (10, 250_000),
+    "gemini-2.5-flash-lite": (15, 250_000),
+    "gemini-2.0-flash": (15, 1_000_000),
+    "gemini-2.0-flash-lite": (30, 1_000_000),
+}
+FALLBACK_QUOTA = (10, 250_000)
+
+
+def estimate_tokens(payload, output_allowance=512):
+    """Rough pre-call token count: ~4 characters per token of prompt, plus room for the answer."""
+    if isinstance(payload, str):
+        chars = len(payload)
+    elif isinstance(payload, dict):
+        chars = estimate_tokens(payload.get("content", ""), 0) * 4
+    elif isinstance(payload, (list, tuple)):
+        chars = sum(estimate_tokens(p, 0) * 4 for p in payload)
+    else:
+        content = getattr(payload, "content", payload)
+        chars = len(content) if isinstance(content, str) else len(str(content))
+    return chars // 4 + 1 + output_allowance
+
+
+class TokenBucket:
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        self.refill()
+        amount = min(amount, self.capacity)  # a huge prompt waits for a full bucket, not forever
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount):
+        # negative amounts charge tokens used beyond the estimate
+        self.level = min(self.capacity, self.level + amount)
+
+
+class ModelQuota:
+
+    def __init__(self, rpm, tpm):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.queue = deque()  # tickets of the waiting callers, sync and async alike; the head is served next
+
+
+class RateLimitScheduler:
+
+    def __init__(self, quotas=None, fallback=FALLBACK_QUOTA):
+        self.quotas = dict(DEFAULT_QUOTAS, **(quotas or {}))
+        self.fallback = fallback
+        self._models = {}
+        self._cond = threading.Condition()
+        self.waited = 0.0
+
+    def acquire(self, model, tokens):
+        """Block until `model` has room for one more request of `tokens` tokens; FIFO among callers."""
+        started = time.monotonic()
+        ticket = object()
+        with self._cond:
+            quota = self._quota(model)
+            quota.queue.append(ticket)
+            try:
+                while True:
+                    taken, wait = self._try_take(quota, ticket, tokens)
+                    if taken:
+                        break
+                    self._cond.wait(wait)
+            except BaseException:
+                self._leave(quota, ticket)
+                raise
+            self.waited += time.monotonic() - started
+
+    async def aacquire(self, model, tokens, poll=0.05):
+        """acquire() for coroutines: waits on the event loop, and a cancelled caller gives up its place in line."""
+        started = time.monotonic()
+        ticket = object()
+        with self._cond:
+            quota = self._quota(model)
+            quota.queue.append(ticket)
+        try:
+            while True:
+                with self._cond:
+                    taken, wait = self._try_take(quota, ticket, tokens)
+                if taken:
+                    break
+                await asyncio.sleep(poll if wait is None else min(wait, poll))
+        except BaseException:
+            with self._cond:
+                self._leave(quota, ticket)
+            raise
+        with self._cond:
+            self.waited += time.monotonic() - started
+
+    def _try_take(self, quota, ticket, tokens):
+        # (True, 0) once taken; else (False, seconds the buckets need), or (False, None) if it is not our turn
+        if quota.queue[0] is not ticket:
+            return False, None
+        wait = max(quota.requests.wait_time(1), quota.tokens.wait_time(tokens))
+        if wait > 0:
+            return False, wait
+        quota.requests.take(1)
+        quota.tokens.take(tokens)
+        quota.queue.popleft()
+        self._cond.notify_all()
+        return True, 0
+
+    def _leave(self, quota, ticket):
+        # a caller that gave up (cancelled, interrupted) must not hold up the ones behind it
+        if ticket in quota.queue:
+            quota.queue.remove(ticket)
+            self._cond.notify_all()
+
+    def settle(self, model, estimated, actual):
+        """Correct the token bucket once the real usage of a call is known."""
+        if actual is None:
+            return
+        with self._cond:
+            self._quota(model).tokens.give_back(estimated - actual)
+            self._cond.notify_all()
+
+    def wrap(self, model_name, runnable):
+        return RateLimitedRunnable(self, model_name, runnable)
+
+    def invoke(self, model_name, runnable, messages):
+        """runnable.invoke(messages) for LangChain chat models, within the quota of `model_name`."""
+        estimated = estimate_tokens(messages)
+        self.acquire(model_name, estimated)
+        message = runnable.invoke(messages)
+        self.settle(model_name, estimated, (getattr(message, "usage_metadata", None) or {}).get("total_tokens"))
+        return message
+
+    async def ainvoke(self, model_name, runnable, messages):
+        estimated = estimate_tokens(messages)
+        await self.aacquire(model_name, estimated)
+        message = await runnable.ainvoke(messages)
+        self.settle(model_name, estimated, (getattr(message, "usage_metadata", None) or {}).get("total_tokens"))
+        return message
+
+    async def astream(self, model_name, runnable, messages):
+        """runnable.astream(messages) within the quota; settled once the stream is through."""
+        estimated = estimate_tokens(messages)
+        await self.aacquire(model_name, estimated)
+        used = None
+        async for chunk in runnable.astream(messages):
+            # streamed usage comes in parts, which add up to the call's total
+            tokens = (getattr(chunk, "usage_metadata", None) or {}).get("total_tokens")
+            if tokens is not None:
+                used = (used or 0) + tokens
+            yield chunk
+        self.settle(model_name, estimated, used)
+
+    def _quota(self, model):
+        model = model.removeprefix("models/")
+        if model not in self._models:
+            self._models[model] = ModelQuota(*self.quotas.get(model, self.fallback))
+        return self._models[model]
+
+
+class RateLimitedRunnable:
+    """A chat model (or bound runnable) whose invoke/ainvoke/astream go through the scheduler."""
+
+    def __init__(self, scheduler, model_name, runnable):
+        self.scheduler = scheduler
+        self.model_name = model_name
+        self.runnable = runnable
+
+    def invoke(self, messages):
+        return self.scheduler.invoke(self.model_name, self.runnable, messages)
+
+    async def ainvoke(self, messages):
+        return await self.scheduler.ainvoke(self.model_name, self.runnable, messages)
+
+    def astream(self, messages):
+        return self.scheduler.astream(self.model_name, self.runnable, messages)
+
+
+class _Delegate:
+    # everything not overridden goes straight to the wrapped object
+    def __init__(self, target):
+        self._target = target
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+
+class _RateLimitedCompletions(_Delegate):
+
+    def __init__(self, completions, scheduler):
+        super().__init__(completions)
+        self._scheduler = scheduler
+
+    def create(self, *, model, messages, **kwargs):
+        estimated = estimate_tokens(messages, kwargs.get("max_tokens") or 512)
+        self._scheduler.acquire(model, estimated)
+        completion = self._target.create(model=model, messages=messages, **kwargs)
+        usage = getattr(completion, "usage", None)
+        self._scheduler.settle(model, estimated, getattr(usage, "total_tokens", None))
+        return completion
+
+
+class RateLimitedOpenAI(_Delegate):
+    """OpenAI client whose chat.completions.create waits for its turn in the scheduler."""
+
+    def __init__(self, client, scheduler):
+        super().__init__(client)
+        self.chat = _Delegate(client.chat)
+        self.chat.completions = _RateLimitedCompletions(client.chat.completions, scheduler)
+
+
+class _RateLimitedModels(_Delegate):
+
+    def __init__(self, models, scheduler):
+        super().__init__(models)
+        self._scheduler = scheduler
+
+    def generate_content(self, *, model, contents, **kwargs):
+        estimated = estimate_tokens(contents)
+        self._scheduler.acquire(model, estimated)
+        response = self._target.generate_content(model=model, contents=contents, **kwargs)
+        usage = getattr(response, "usage_metadata", None)
+        self._scheduler.settle(model, estimated, getattr(usage, "total_token_count", None))
+        return response
+
+
+class RateLimitedGenai(_Delegate):
+    """genai.Client whose models.generate_content waits for its turn in the scheduler."""
+
+    def __init__(self, client, scheduler):
+        super().__init__(client)
+        self.models = _RateLimitedModels(client.models, scheduler)
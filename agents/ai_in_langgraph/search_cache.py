@@ -0,0 +1,250 @@
+"""
+Shared cache for web search calls (DDGS, Tavily).
+
+Results are stored in SQLite keyed by provider + normalized query (+ call
+parameters). Within `ttl` a cached answer is returned as is; after that, and up
+to `stale_ttl` more, the stale answer is still returned immediately while a
+background refresh fetches a fresh one (stale-while-revalidate). When the
+provider fails - DDG rate limiting, say - any cached answer beats an error.
+
+Only dict/list answers without an "error" key are stored: a provider error
+is passed on to the caller, never served from the cache as if it were results.
+
+URLs are normalized (scheme/host case, www., fragments, tracking parameters)
+so the same page under another URL shows up only once in a result list, and -
+with SeenUrls, per conversation (thread_id) - a page already handed to a
+conversation by one provider or query can be dropped from the results of
+another before its content is handed to the model twice.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PATH = os.getenv("SEARCH_CACHE_PATH", str(Path.home() / ".cache" / "llms" / "search.sqlite"))
+TRACKING_PARAMS = re.compile(r"^(utm_\w+|gclid|fbclid|mc_cid|mc_eid|ref|ref_src)$")
+MISS = object()
+
+
+def normalize_query(query):
+    return " ".join(query.lower().split()).strip(" ?!.")
+
+
+def normalize_url(url):
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().removeprefix("www.")
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query) if not TRACKING_PARAMS.match(k)))
+    return urlunsplit((parts.scheme.lower() or "https", host, parts.path.rstrip("/") or "/", query, ""))
+
+
+def unique_urls(items, url=lambda item: item):
+    """`items` without the ones whose URL normalizes to that of an earlier item."""
+    seen, fresh = set(), []
+    for item in items:
+        normalized = normalize_url(url(item))
+        if normalized not in seen:
+            seen.add(normalized)
+            fresh.append(item)
+    return fresh
+
+
+def cacheable(results):
+    return isinstance(results, (dict, list)) and not (isinstance(results, dict) and "error" in results)
+
+
+class SearchCache:
+
+    def __init__(self, path=DEFAULT_PATH, ttl=3600, stale_ttl=24 * 3600):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS searches (
+                key      TEXT PRIMARY KEY,
+                provider TEXT NOT NULL,
+                query    TEXT NOT NULL,
+                results  TEXT NOT NULL,
+                created  REAL NOT NULL
+            )""")
+        self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="search-refresh")
+        self._refreshing = set()
+        self.stats = {"fresh": 0, "stale": 0, "miss": 0, "fallback": 0}
+
+    @staticmethod
+    def key(provider, query, params=None):
+        payload = json.dumps([provider, normalize_query(query), params or {}], sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def search(self, provider, query, fetch, params=None):
+        """Results of `fetch()` for (provider, query, params), from cache whenever that is good enough."""
+        key = self.key(provider, query, params)
+        row, cached = self._lookup(key, provider, query, fetch)
+        if cached is not MISS:
+            return cached
+        try:
+            results = self._store(key, provider, query, fetch())
+        except Exception:
+            if row is None:
+                raise
+            results = None
+        return self._fallback(row, results)
+
+    async def asearch(self, provider, query, afetch, params=None, fetch=None):
+        """search() for coroutines: a miss awaits `afetch()` instead of blocking the event loop.
+
+        A stale answer is refreshed on the background threads with `fetch()`,
+        or with `afetch()` on an event loop of their own when there is none.
+        """
+        key = self.key(provider, query, params)
+        row, cached = self._lookup(key, provider, query, fetch or (lambda: asyncio.run(afetch())))
+        if cached is not MISS:
+            return cached
+        try:
+            results = self._store(key, provider, query, await afetch())
+        except Exception:
+            if row is None:
+                raise
+            results = None
+        return self._fallback(row, results)
+
+    def _lookup(self, key, provider, query, fetch):
+        # (row, cached results) - or (row, MISS) when they have to be fetched; the row is kept as the fallback
+        with self._lock:
+            row = self._conn.execute("SELECT results, created FROM searches WHERE key = ?", (key,)).fetchone()
+        age = time.time() - row[1] if row else None
+        if row and age <= self.ttl:
+            self._count("fresh")
+            return row, json.loads(row[0])
+        if row and age <= self.ttl + self.stale_ttl:
+            self._count("stale")
+            self._refresh_later(key, provider, query, fetch)
+            return row, json.loads(row[0])
+        self._count("miss")
+        return row, MISS
+
+    def _fallback(self, row, results):
+        if row is not None and not cacheable(results):
+            self._count("fallback")
+            return json.loads(row[0])
+        return results
+
+    def _count(self, outcome):
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def _store(self, key, provider, query, results):
+        if not cacheable(results):
+            # langchain_tavily hands back {"error": exception} instead of raising
+            return results
+        try:
+            payload = json.dumps(results)
+        except (TypeError, ValueError):
+            return results
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO searches VALUES (?, ?, ?, ?, ?)",
+                               (key, provider, normalize_query(query), payload, time.time()))
+        return results
+
+    def _refresh_later(self, key, provider, query, fetch):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self._store(key, provider, query, fetch())
+            except Exception as e:
+                print(f"background refresh of {provider} search failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._refresher.submit(refresh)
+
+
+class SeenUrls:
+    """URLs already handed to each conversation, so a thread is not given the same page twice.
+
+    Kept per thread_id, for the `max_threads` most recently active threads and
+    the `max_urls` most recent URLs of each; one conversation never loses
+    results because of what another one was shown.
+    """
+
+    def __init__(self, max_threads=256, max_urls=512):
+        self.max_threads = max_threads
+        self.max_urls = max_urls
+        self._lock = threading.Lock()
+        self._threads = OrderedDict()  # thread_id -> OrderedDict(normalized URL -> key of the search that gave it)
+
+    def unique(self, thread_id, items, source, url=lambda item: item):
+        """Drop items whose URL another search (any provider, any query) already gave this thread.
+
+        `source` is the key of the search the items come from; asking the same
+        search again gets its URLs back. A search whose every page was seen
+        keeps its results rather than come back empty.
+        """
+        items = unique_urls(items, url)
+        with self._lock:
+            seen = self._threads.pop(thread_id, None) or OrderedDict()
+            self._threads[thread_id] = seen
+            while len(self._threads) > self.max_threads:
+                self._threads.popitem(last=False)
+            fresh = [item for item in items if seen.get(normalize_url(url(item)), source) == source]
+            for item in fresh:
+                normalized = normalize_url(url(item))
+                seen[normalized] = source
+                seen.move_to_end(normalized)
+            while len(seen) > self.max_urls:
+                seen.popitem(last=False)
+        return fresh or items
+
+
+def cached_tool(tool, cache, provider, seen=None):
+    """The same tool (name, description, schema) with its calls going through `cache`.
+
+    With a SeenUrls, URLs the same conversation (the thread_id of the graph
+    run the call is made from) was already given are dropped from a result's
+    "results" list, so the model does not read the same page twice.
+    """
+    # LangChain only here: 02 and 05 use the cache without it
+    from langchain_core.runnables import RunnableConfig
+    from langchain_core.tools import StructuredTool
+
+    def split(kwargs):
+        return str(kwargs.get("query", "")), {k: v for k, v in kwargs.items() if k != "query" and v is not None}
+
+    def dedup(config, query, params, result):
+        thread_id = (config or {}).get("configurable", {}).get("thread_id")
+        if seen is not None and thread_id is not None \
+                and isinstance(result, dict) and isinstance(result.get("results"), list):
+            source = cache.key(provider, query, params)
+            result = {**result, "results": seen.unique(thread_id, result["results"], source,
+                                                       url=lambda r: r.get("url", ""))}
+        return result
+
+    def run(config: RunnableConfig, **kwargs):
+        query, params = split(kwargs)
+        return dedup(config, query, params, cache.search(provider, query, lambda: tool.invoke(kwargs), params))
+
+    # the wrapped tool's own async path (TavilySearch: aiohttp), so ainvoke does not fall back to a thread
+    async def arun(config: RunnableConfig, **kwargs):
+        query, params = split(kwargs)
+        result = await cache.asearch(provider, query, lambda: tool.ainvoke(kwargs), params,
+                                     fetch=lambda: tool.invoke(kwargs))
+        return dedup(config, query, params, result)
+
+    return StructuredTool.from_function(func=run, coroutine=arun, name=tool.name, description=tool.description,
+                                        args_schema=tool.args_schema)
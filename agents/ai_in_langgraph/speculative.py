@@ -0,0 +1,68 @@
+"""
+Speculative tool execution while the model is still generating.
+
+take_action normally starts only once call_openai has the complete AIMessage.
+When the tools-bound model streams, a tool call is often complete long before
+the message is - its name has arrived and its arguments form a whole JSON
+object (a strict json.loads never accepts a prefix of one). SpeculativeCalls
+watches the chunks and starts such calls right away, so Tavily / weather
+latency overlaps with the rest of the generation. take_action then picks up
+the running task for every call of the final message that matches one started
+early (same name, same arguments); anything the final message does not
+contain is cancelled and its result thrown away.
+
+Only use it with tools that are safe to run for nothing - lookups, not actions.
+"""
+import asyncio
+import json
+
+
+def call_key(name, args):
+    return name, json.dumps(args, sort_keys=True)
+
+
+class SpeculativeCalls:
+
+    def __init__(self, start):
+        # start: coroutine function tool_call -> result (ToolRunner.acall)
+        self._start = start
+        self._buffers = {}
+        self._unindexed = 0
+        self.tasks = {}
+
+    def feed(self, chunk):
+        for tool_chunk in getattr(chunk, "tool_call_chunks", None) or []:
+            index = tool_chunk.get("index")
+            if index is None:
+                # providers that send whole calls (Gemini) do not number them
+                index = ("whole", self._unindexed)
+                self._unindexed += 1
+            buffer = self._buffers.setdefault(index, {"name": "", "args": "", "id": None, "started": False})
+            buffer["name"] += tool_chunk.get("name") or ""
+            buffer["args"] += tool_chunk.get("args") or ""
+            buffer["id"] = buffer["id"] or tool_chunk.get("id")
+            self._maybe_start(buffer)
+
+    def take(self, tool_call):
+        """The task started early for this call of the final message, if there is one."""
+        return self.tasks.pop(call_key(tool_call["name"], tool_call["args"]), None)
+
+    def discard(self):
+        for task in self.tasks.values():
+            task.cancel()
+        self.tasks.clear()
+
+    def _maybe_start(self, buffer):
+        if buffer["started"] or not buffer["name"]:
+            return
+        try:
+            args = json.loads(buffer["args"]) if buffer["args"] else None
+        except ValueError:
+            return  # arguments still streaming
+        if not isinstance(args, dict):
+            return
+        buffer["started"] = True
+        key = call_key(buffer["name"], args)
+        if key not in self.tasks:
+            tool_call = {"name": buffer["name"], "args": args, "id": buffer["id"]}
+            self.tasks[key] = asyncio.create_task(self._start(tool_call))
@@ -0,0 +1,119 @@
+"""
+Concurrent execution of the tool calls the LLM requests in a single turn.
+
+Gemini happily asks for several TavilySearch (or weather) lookups at once;
+running them one after another makes the turn as slow as the sum of all
+network round trips. The helpers here run them side by side - a bounded
+thread pool for sync tools, asyncio.gather over ainvoke for async ones -
+while capping how many calls of the same tool run at once, and return the
+ToolMessages in the same order as the tool_calls they answer.
+
+On the async path tools without a native coroutine are pushed to a worker
+thread with asyncio.to_thread, so a blocking HTTP call never stalls the event
+loop that astream_events (and every other thread_id on it) is running on.
+"""
+import asyncio
+import contextvars
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.messages import ToolMessage
+from langchain_core.tools import BaseTool, StructuredTool
+
+BAD_TOOL_NAME = "bad tool name, retry"
+
+
+class ToolRunner:
+
+    def __init__(self, tools, max_workers=8, per_tool_limit=4, timeout=None, timeouts=None):
+        # tools: dict name -> tool, as kept by Agent
+        self.tools = tools
+        self.max_workers = max_workers
+        self.per_tool_limit = per_tool_limit
+        # per-call timeout in seconds (async path), optionally overridden per tool name
+        self.timeout = timeout
+        self.timeouts = timeouts or {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+        self._sync_limits = {name: threading.BoundedSemaphore(per_tool_limit) for name in tools}
+        # asyncio semaphores are bound to the loop they are first used on, so build them lazily per loop;
+        # keyed by the loop itself, so a closed loop's semaphores go with it
+        self._async_limits = weakref.WeakKeyDictionary()
+
+    def run(self, tool_calls):
+        """Run tool calls on the thread pool; wall time is the slowest call, not the sum."""
+        # each call runs in a copy of the caller's context, so tracing spans nest under the action node
+        futures = [self._executor.submit(contextvars.copy_context().run, self._invoke, t) for t in tool_calls]
+        return [self._to_message(t, f.result()) for t, f in zip(tool_calls, futures)]
+
+    async def arun(self, tool_calls, speculative=None):
+        """Run tool calls concurrently on the running event loop via tool.ainvoke.
+
+        `speculative` (a SpeculativeCalls) holds calls already started while the
+        model was still streaming; those are awaited instead of run again, and
+        the ones the final message does not ask for are cancelled.
+        """
+        try:
+            calls = [(speculative and speculative.take(t)) or self._ainvoke(t) for t in tool_calls]
+            results = await asyncio.gather(*calls)
+        finally:
+            if speculative:
+                speculative.discard()
+        return [self._to_message(t, result) for t, result in zip(tool_calls, results)]
+
+    async def acall(self, t):
+        """One tool call with the same limits and timeouts as arun, result not yet wrapped."""
+        return await self._ainvoke(t)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _invoke(self, t):
+        print(f"Calling: {t}")
+        if not t['name'] in self.tools:
+            print("\n ....bad tool name....")
+            return BAD_TOOL_NAME
+        with self._sync_limits[t['name']]:
+            try:
+                return self.tools[t['name']].invoke(t['args'])
+            except Exception as e:
+                # one failing tool should not sink the other calls of the same turn
+                return f"tool error: {e}"
+
+    async def _ainvoke(self, t):
+        print(f"Calling: {t}")
+        if not t['name'] in self.tools:
+            print("\n ....bad tool name....")
+            return BAD_TOOL_NAME
+        tool = self.tools[t['name']]
+        timeout = self.timeouts.get(t['name'], self.timeout)
+        async with self._async_limit(t['name']):
+            if has_native_async(tool):
+                call = tool.ainvoke(t['args'])
+            else:
+                # sync-only tool: keep the blocking call off the event loop
+                call = asyncio.to_thread(tool.invoke, t['args'])
+            try:
+                return await asyncio.wait_for(call, timeout)
+            except asyncio.TimeoutError:
+                # a to_thread call cannot be interrupted - it finishes in the background, the result is dropped
+                return f"tool timed out after {timeout}s, retry or answer without it"
+            except Exception as e:
+                return f"tool error: {e}"
+
+    def _async_limit(self, name):
+        limits = self._async_limits.setdefault(asyncio.get_running_loop(), {})
+        if name not in limits:
+            limits[name] = asyncio.Semaphore(self.per_tool_limit)
+        return limits[name]
+
+    @staticmethod
+    def _to_message(t, result):
+        return ToolMessage(tool_call_id=t['id'], name=t['name'], content=str(result))
+
+
+def has_native_async(tool):
+    """True if the tool brings its own coroutine rather than BaseTool's run-in-executor default."""
+    if isinstance(tool, StructuredTool):
+        return tool.coroutine is not None
+    return type(tool)._arun is not BaseTool._arun
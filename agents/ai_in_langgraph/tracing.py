@@ -0,0 +1,253 @@
+"""
+Spans and metrics for the LangGraph Agent: which hop of a thread is the slow one?
+
+A Tracer wraps the graph nodes, the ToolRunner and the checkpointer of an
+Agent and records
+
+- a span per node run (llm / action), with wall time, CPU time (sync nodes
+  only - an async node shares its thread with every other coroutine), the
+  thread_id and step it ran for, and for llm spans the prompt/completion
+  tokens from the AIMessage's usage_metadata,
+- a child span per tool call, and per checkpointer write (put / put_writes),
+- latency histograms per node, tool and checkpointer operation, and token
+  counters per model.
+
+Spans nest through a context variable, so a graph run in a worker thread or an
+asyncio task gets its own trace. They are written as JSON lines shaped like
+OTLP spans (traceId, spanId, parentSpanId, startTimeUnixNano, attributes as
+key/value pairs) to `spans_path` as they end; prometheus_text() renders the
+metrics in the Prometheus text exposition format.
+"""
+import contextlib
+import contextvars
+import inspect
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict, deque
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SAVER_WRITES = ("put", "put_writes", "aput", "aput_writes")
+
+_current_span = contextvars.ContextVar("tracing_span", default=None)
+
+
+class Span:
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "duration", "cpu",
+                 "attributes", "error", "metric")
+
+    def __init__(self, name, parent, attributes, metric=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.duration = None
+        self.cpu = None
+        self.attributes = dict(attributes or {})
+        self.error = None
+        self.metric = metric  # (histogram name, label, label value) the duration is observed in
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def as_otlp(self):
+        return {"traceId": self.trace_id, "spanId": self.span_id, "parentSpanId": self.parent_id or "",
+                "name": self.name, "kind": "SPAN_KIND_INTERNAL",
+                "startTimeUnixNano": self.start_ns, "endTimeUnixNano": self.end_ns,
+                "attributes": [{"key": k, "value": otlp_value(v)} for k, v in self.attributes.items()],
+                "status": {"code": "STATUS_CODE_ERROR", "message": self.error} if self.error
+                else {"code": "STATUS_CODE_OK"}}
+
+
+def otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Histogram:
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+
+class Tracer:
+
+    def __init__(self, spans_path=None, keep=10_000):
+        self._lock = threading.Lock()
+        self._file = open(spans_path, "a") if spans_path else None
+        self.spans = deque(maxlen=keep)  # most recent finished spans
+        self.histograms = defaultdict(Histogram)  # (metric, label name, label value) -> Histogram
+        self.counters = defaultdict(float)  # (metric, labels as sorted tuple) -> value
+
+    @contextlib.contextmanager
+    def span(self, name, attributes=None, cpu=True, metric=None):
+        span = Span(name, _current_span.get(), attributes, metric)
+        token = _current_span.set(span)
+        started, cpu_started = time.perf_counter(), time.thread_time() if cpu else None
+        try:
+            yield span
+        except BaseException as e:
+            span.error = repr(e)
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            span.end_ns = span.start_ns + int(span.duration * 1e9)
+            if cpu:
+                span.cpu = time.thread_time() - cpu_started
+                span.set("cpu_seconds", span.cpu)
+            _current_span.reset(token)
+            self._finish(span)
+
+    def node(self, name, function):
+        """`function` (a graph node, sync or async) with a span per run.
+
+        The wrapper takes LangGraph's `config` to label the span with the
+        thread_id and step it ran for.
+        """
+        def attributes(config):
+            config = config or {}
+            return {"graph.node": name,
+                    "graph.thread_id": str(config.get("configurable", {}).get("thread_id", "")),
+                    "graph.step": config.get("metadata", {}).get("langgraph_step", -1)}
+
+        metric = ("agent_node_seconds", "node", name)
+        if inspect.iscoroutinefunction(function):
+            async def traced(state, config=None):
+                with self.span(f"node {name}", attributes(config), cpu=False, metric=metric):
+                    return await function(state)
+        else:
+            def traced(state, config=None):
+                with self.span(f"node {name}", attributes(config), metric=metric):
+                    return function(state)
+        return traced
+
+    def tool(self, name):
+        return self.span(f"tool {name}", {"tool.name": name}, cpu=False, metric=("agent_tool_seconds", "tool", name))
+
+    def record_llm(self, message, model=""):
+        """Token counts of an AIMessage, on the current span and in the per-model counters."""
+        usage = getattr(message, "usage_metadata", None) or {}
+        prompt, completion = usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+        span = _current_span.get()
+        if span is not None:
+            span.set("llm.model", model)
+            span.set("llm.prompt_tokens", prompt)
+            span.set("llm.completion_tokens", completion)
+            span.set("llm.tool_calls", len(getattr(message, "tool_calls", None) or []))
+        with self._lock:
+            self.counters[("agent_llm_tokens_total", (("kind", "prompt"), ("model", model)))] += prompt
+            self.counters[("agent_llm_tokens_total", (("kind", "completion"), ("model", model)))] += completion
+
+    def instrument_tool_runner(self, runner):
+        """Span and histogram entry per tool call made through a ToolRunner (patched on the instance)."""
+        invoke, ainvoke = runner._invoke, runner._ainvoke
+
+        def traced_invoke(t):
+            with self.tool(t['name']):
+                return invoke(t)
+
+        async def traced_ainvoke(t):
+            with self.tool(t['name']):
+                return await ainvoke(t)
+
+        runner._invoke, runner._ainvoke = traced_invoke, traced_ainvoke
+        return runner
+
+    def instrument_saver(self, saver):
+        """Span and histogram entry per checkpointer write (patched on the instance)."""
+        for operation in SAVER_WRITES:
+            method = getattr(saver, operation, None)
+            if method is not None:
+                setattr(saver, operation, self._traced_write(operation, method))
+        return saver
+
+    def _traced_write(self, operation, method):
+        def span():
+            return self.span(f"checkpoint {operation}", {"checkpoint.operation": operation}, cpu=False,
+                             metric=("agent_checkpoint_seconds", "operation", operation))
+
+        if inspect.iscoroutinefunction(method):
+            async def traced(*args, **kwargs):
+                with span():
+                    return await method(*args, **kwargs)
+        else:
+            def traced(*args, **kwargs):
+                with span():
+                    return method(*args, **kwargs)
+        return traced
+
+    def _finish(self, span):
+        with self._lock:
+            self.spans.append(span)
+            if span.metric:
+                self.histograms[span.metric].observe(span.duration)
+            if span.cpu is not None and "graph.node" in span.attributes:
+                key = ("agent_node_cpu_seconds_total", (("node", span.attributes["graph.node"]),))
+                self.counters[key] += span.cpu
+            if self._file:
+                self._file.write(json.dumps(span.as_otlp()) + "\n")
+                self._file.flush()
+
+    def prometheus_text(self):
+        lines, typed = [], set()
+        with self._lock:
+            for (metric, label, value), histogram in sorted(self.histograms.items()):
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} histogram")
+                    typed.add(metric)
+                cumulative = 0
+                for bound, count in zip((*histogram.buckets, "+Inf"), histogram.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{{label}="{value}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{{label}="{value}"}} {histogram.sum}')
+                lines.append(f'{metric}_count{{{label}="{value}"}} {histogram.count}')
+            for (metric, labels), value in sorted(self.counters.items()):
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} counter")
+                    typed.add(metric)
+                rendered = ",".join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f"{metric}{{{rendered}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        # written next to the target and renamed, so a node_exporter textfile collector never reads half a file
+        partial = f"{path}.partial"
+        with open(partial, "w") as outfile:
+            outfile.write(self.prometheus_text())
+        os.replace(partial, path)
+
+    def summary(self):
+        """(span name, count, total seconds, slowest) for every span name, the most expensive first."""
+        totals = defaultdict(lambda: [0, 0.0, 0.0])
+        with self._lock:
+            for span in self.spans:
+                entry = totals[span.name]
+                entry[0] += 1
+                entry[1] += span.duration
+                entry[2] = max(entry[2], span.duration)
+        return sorted(((name, *entry) for name, entry in totals.items()), key=lambda row: -row[2])
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
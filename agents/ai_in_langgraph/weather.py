@@ -0,0 +1,156 @@
+"""
+The get_weather_forecast tool, backed by one pooled keep-alive HTTP session.
+
+requests.get opens (and TLS-handshakes) a new connection to open-meteo on every
+call; the shared Session keeps connections alive, and retries 429/5xx with
+exponential backoff. Several (location, date) pairs are answered by a single
+open-meteo request - the API takes comma separated latitude/longitude lists -
+so a turn asking about SF, LA and NY costs one round trip, not three.
+Locations are resolved by geocode_cache.Geocoder - persistent cache, optional
+offline GeoNames gazetteer (GAZETTEER_PATH), and only then Nominatim, throttled
+to its 1 request/s usage policy. Forecasts already fetched for the same grid
+cell and date are served from forecast_cache.ForecastCache.
+"""
+import os
+import threading
+from urllib.parse import urlsplit
+
+from geopy.extra.rate_limiter import RateLimiter
+from geopy.geocoders import Nominatim
+from langchain_core.tools import tool
+from pydantic import BaseModel, Field
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from forecast_cache import ForecastCache
+from geocode_cache import Gazetteer, GeocodeCache, Geocoder
+
+OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+
+
+def fake_base_url():
+    # FAKE_PROVIDERS=1: Nominatim and open-meteo are answered by a local stand-in, see fake_providers.py;
+    # looked up per request, so importing the tool starts no server and reads no settings
+    if not os.getenv("FAKE_PROVIDERS"):
+        return None
+    from fake_providers import fake_url
+    return fake_url()
+
+
+def make_session(pool_size=16, retries=3, backoff=0.5):
+    session = requests.Session()
+    retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=("GET",), respect_retry_after_header=True)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["User-Agent"] = "weather-app"
+    return session
+
+
+def make_geocoder(fake=None):
+    if fake:
+        geolocator = Nominatim(user_agent="weather-app", domain=urlsplit(fake).netloc, scheme="http")
+    else:
+        geolocator = Nominatim(user_agent="weather-app")
+    return Geocoder(
+        # https://operations.osmfoundation.org/policies/nominatim/ - at most 1 request per second
+        remote=RateLimiter(geolocator.geocode, min_delay_seconds=0 if fake else 1.0, swallow_exceptions=False),
+        cache=GeocodeCache(":memory:") if fake else None,
+        gazetteer=Gazetteer.load(os.environ["GAZETTEER_PATH"]) if os.getenv("GAZETTEER_PATH") else None,
+    )
+
+
+session = make_session()
+forecast_cache = ForecastCache()
+_geocoders = {}  # fake base URL (None for the real Nominatim) -> Geocoder, built on first use
+_geocoders_lock = threading.Lock()
+
+
+def get_geocoder(fake=None):
+    with _geocoders_lock:
+        if fake not in _geocoders:
+            _geocoders[fake] = make_geocoder(fake)
+        return _geocoders[fake]
+
+
+def fetch_hourly_temperatures(points, start_date, end_date, timeout=10):
+    """Hourly temperature_2m for every (latitude, longitude) in `points`, in a single request.
+
+    Returns one (times, temperatures) pair of lists per point, in order.
+    """
+    params = {
+        "latitude": ",".join(f"{lat:.4f}" for lat, _ in points),
+        "longitude": ",".join(f"{lon:.4f}" for _, lon in points),
+        "hourly": "temperature_2m",
+        "start_date": start_date,
+        "end_date": end_date,
+    }
+    fake = fake_base_url()
+    response = session.get(f"{fake}/v1/forecast" if fake else OPEN_METEO_URL, params=params, timeout=timeout)
+    response.raise_for_status()
+    data = response.json()
+    # a single location comes back as an object, several as a list
+    if isinstance(data, dict):
+        data = [data]
+    return [(d["hourly"]["time"], d["hourly"]["temperature_2m"]) for d in data]
+
+
+def get_forecasts(pairs):
+    """[(location, date), ...] -> [{time: temp} or {"error": ...}, ...] with at most one open-meteo round trip."""
+    geocoder = get_geocoder(fake_base_url())
+    places, geocode_errors = {}, {}
+    for location, _ in pairs:
+        if location not in places:
+            try:
+                places[location] = geocoder.geocode(location)
+            except Exception as e:
+                # Nominatim down or timing out: report it, rather than "Location not found"
+                places[location] = None
+                geocode_errors[location] = {"error": f"Geocoding failed: {e}"}
+    cells = {location: forecast_cache.cell(place.latitude, place.longitude)
+             for location, place in places.items() if place}
+    # whatever the cache cannot answer is fetched in a single multi-coordinate request
+    missing = {(cells[location], date) for location, date in pairs
+               if location in cells and forecast_cache.get(cells[location], date) is None}
+    fetch_error = None
+    if missing:
+        wanted = sorted({cell for cell, _ in missing})
+        dates = [date for _, date in missing]
+        try:
+            series = fetch_hourly_temperatures([forecast_cache.center(cell) for cell in wanted], min(dates), max(dates))
+            for cell, (times, temperatures) in zip(wanted, series):
+                forecast_cache.put(cell, times, temperatures)
+        except Exception as e:
+            fetch_error = {"error": str(e)}
+    results = []
+    for location, date in pairs:
+        if location not in cells:
+            results.append(geocode_errors.get(location, {"error": "Location not found"}))
+            continue
+        day = forecast_cache.get(cells[location], date, count=False)
+        results.append(day.as_dict() if day else fetch_error or {"error": f"No forecast for {date}"})
+    return results
+
+
+class SearchInput(BaseModel):
+    location: str = Field(description="The city and state, e.g., San Francisco")
+    date: str = Field(description="the forecasting date for when to get the weather format (yyyy-mm-dd)")
+
+
+class MultiSearchInput(BaseModel):
+    queries: list[SearchInput] = Field(description="the (location, date) pairs to get the weather for")
+
+
+@tool("get_weather_forecast", args_schema=SearchInput, return_direct=True)
+def get_weather_forecast(location: str, date: str):
+    """Retrieves the weather using Open-Meteo API for a given location (city) and a date (yyyy-mm-dd). Returns a list dictionary with the time and temperature for each hour."""
+    return get_forecasts([(location, date)])[0]
+
+
+@tool("get_weather_forecasts", args_schema=MultiSearchInput, return_direct=True)
+def get_weather_forecasts(queries: list[SearchInput]):
+    """Retrieves the weather using Open-Meteo API for several locations (cities) and dates (yyyy-mm-dd) at once. Returns one dictionary with the time and temperature for each hour per query."""
+    pairs = [(q.location, q.date) if isinstance(q, SearchInput) else (q["location"], q["date"]) for q in queries]
+    return dict(zip((f"{location} {date}" for location, date in pairs), get_forecasts(pairs)))
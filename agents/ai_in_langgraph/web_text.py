@@ -0,0 +1,134 @@
+"""
+Visible text of web pages for regular_search, extracted while downloading.
+
+Fetching a whole page, building the full BeautifulSoup DOM and serializing
+soup.body only to keep its first 50k characters is mostly wasted work. Here
+the response is read in chunks and fed to an incremental HTMLParser, which
+drops script/style/svg/... subtrees as they stream by, keeps only visible
+text, and lets the download stop as soon as the text budget is filled.
+
+fetch_visible_texts does the same for many URLs at once on asyncio: one shared
+httpx connection pool, a cap on concurrent requests per host, a timeout per
+page, and results yielded as pages finish - so five result pages take about
+as long as the slowest one. Once enough text has been collected the fetches
+still in flight are cancelled.
+"""
+import asyncio
+import codecs
+from collections import defaultdict
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+
+HEADERS = {'User-Agent': 'Mozilla/5.0'}
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "math", "head", "iframe", "canvas", "select"}
+BLOCK_TAGS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6",
+              "section", "article", "header", "footer", "table", "ul", "ol"}
+
+
+class VisibleTextParser(HTMLParser):
+
+    def __init__(self, max_chars=50_000):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.parts = []
+        self.size = 0
+        self.skip_depth = 0
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "body":
+            self.skip_depth = 0  # whatever was left open in <head> ends here
+        elif tag in SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+
+    def handle_data(self, data):
+        if self.skip_depth or self.done:
+            return
+        # kept raw: a chunk boundary may split a word, whitespace is collapsed in text()
+        self.parts.append(data)
+        self.size += len(data.strip())
+        self.done = self.size >= self.max_chars
+
+    def text(self):
+        lines = (" ".join(line.split()) for line in "".join(self.parts).split("\n"))
+        return "\n".join(line for line in lines if line)[:self.max_chars]
+
+
+def stream_visible_text(url, max_chars=50_000, chunk_size=16 * 1024, timeout=10, session=None):
+    """Visible text of `url`, at most max_chars of it; None if the page could not be fetched."""
+    http = session or requests
+    with http.get(url, headers=HEADERS, stream=True, timeout=timeout) as response:
+        if response.status_code != 200:
+            return None
+        parser = VisibleTextParser(max_chars)
+        decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+        for chunk in response.iter_content(chunk_size):
+            parser.feed(decoder.decode(chunk))
+            if parser.done:
+                break  # leaving the with block drops the rest of the download
+        else:
+            parser.feed(decoder.decode(b"", final=True))
+            parser.close()
+    return parser.text()
+
+
+async def fetch_visible_texts(urls, max_chars=50_000, total_chars=None, per_host=2, max_connections=10, timeout=10):
+    """Yield (url, visible text or None) for each URL as soon as its page is in.
+
+    Stops - cancelling the fetches still running - once `total_chars` of text
+    have been yielded.
+    """
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    host_slots = defaultdict(lambda: asyncio.Semaphore(per_host))
+    async with httpx.AsyncClient(headers=HEADERS, limits=limits, timeout=timeout, follow_redirects=True) as client:
+        tasks = [asyncio.create_task(
+                     _fetch_visible_text(client, host_slots[urlsplit(url).netloc], url, max_chars, timeout))
+                 for url in dict.fromkeys(urls)]
+        collected = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                url, text = await next_done
+                yield url, text
+                collected += len(text or "")
+                if total_chars is not None and collected >= total_chars:
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _fetch_visible_text(client, host_slot, url, max_chars, timeout):
+    async with host_slot:
+        try:
+            # httpx's timeout bounds each read; this one bounds the whole page, slow-drip servers included
+            return url, await asyncio.wait_for(_read_visible_text(client, url, max_chars), timeout)
+        except (httpx.HTTPError, httpx.InvalidURL, UnicodeError, LookupError, asyncio.TimeoutError) as e:
+            # one bad URL or slow page is skipped, the other results still come in
+            print(f"could not fetch {url}: {e!r}")
+            return url, None
+
+
+async def _read_visible_text(client, url, max_chars, chunk_size=16 * 1024):
+    async with client.stream("GET", url) as response:
+        if response.status_code != 200:
+            return None
+        parser = VisibleTextParser(max_chars)
+        decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+        async for chunk in response.aiter_bytes(chunk_size):
+            parser.feed(decoder.decode(chunk))
+            if parser.done:
+                break
+        else:
+            parser.feed(decoder.decode(b"", final=True))
+            parser.close()
+    return parser.text()
@@ -0,0 +1,95 @@
+"""
+One local index of the Gemini and OpenAI models, so a script can pick a model
+by capability (token limits, supported methods) without asking the network.
+
+Both catalogs are fetched side by side, Gemini with the largest page size the
+API takes - the google-genai Pager walks any further pages itself, the first
+one included. The merged index is kept as JSON under ~/.cache/llms (or
+MODEL_CATALOG_PATH) and refreshed per provider once it is older than `ttl`;
+a provider that cannot be reached keeps its previous entries.
+"""
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+DEFAULT_PATH = os.getenv("MODEL_CATALOG_PATH", str(Path.home() / ".cache" / "llms" / "models.json"))
+DEFAULT_TTL = 24 * 3600
+
+
+def fetch_gemini(api_key, page_size=1000):
+    from google import genai
+
+    client = genai.Client(api_key=api_key)
+    return [{"provider": "gemini",
+             "name": model.name.removeprefix("models/"),
+             "display_name": model.display_name,
+             "input_token_limit": model.input_token_limit,
+             "output_token_limit": model.output_token_limit,
+             "methods": list(model.supported_actions or [])}
+            for model in client.models.list(config={"page_size": page_size})]
+
+
+def fetch_openai(api_key):
+    from openai import OpenAI
+
+    client = OpenAI(api_key=api_key)
+    # the models endpoint says nothing about token limits or methods
+    return [{"provider": "openai", "name": model.id, "display_name": model.id,
+             "input_token_limit": None, "output_token_limit": None, "methods": [], "owned_by": model.owned_by}
+            for model in client.models.list()]
+
+
+FETCHERS = {"gemini": fetch_gemini, "openai": fetch_openai}
+
+
+def read_index(path=DEFAULT_PATH):
+    try:
+        with open(path) as infile:
+            return json.load(infile)
+    except (OSError, ValueError):
+        return {"fetched": {}, "models": []}
+
+
+def write_index(index, path=DEFAULT_PATH):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    partial = f"{path}.partial"
+    with open(partial, "w") as outfile:
+        json.dump(index, outfile, indent=1)
+    os.replace(partial, path)
+
+
+def load_catalog(keys=None, path=DEFAULT_PATH, ttl=DEFAULT_TTL, refresh=False):
+    """All models of the providers in `keys` ({"gemini": api key, "openai": api key}), from the index when fresh.
+
+    Without keys the index is returned as it is, however old.
+    """
+    index = read_index(path)
+    now = time.time()
+    stale = {provider: key for provider, key in (keys or {}).items()
+             if key and (refresh or now - index["fetched"].get(provider, 0) > ttl)}
+    if stale:
+        with ThreadPoolExecutor(max_workers=len(stale)) as pool:
+            futures = {provider: pool.submit(FETCHERS[provider], key) for provider, key in stale.items()}
+        for provider, future in futures.items():
+            try:
+                models = future.result()
+            except Exception as e:
+                print(f"could not list {provider} models, keeping the cached ones: {e}")
+                continue
+            index["models"] = [m for m in index["models"] if m["provider"] != provider] + models
+            index["fetched"][provider] = now
+        write_index(index, path)
+    return index["models"]
+
+
+def find_models(catalog, provider=None, method=None, min_input_tokens=0, min_output_tokens=0, name_contains=None):
+    """Models matching every given condition, the largest context window first."""
+    found = [m for m in catalog
+             if (provider is None or m["provider"] == provider)
+             and (method is None or method in m["methods"])
+             and (m["input_token_limit"] or 0) >= min_input_tokens
+             and (m["output_token_limit"] or 0) >= min_output_tokens
+             and (name_contains is None or name_contains in m["name"])]
+    return sorted(found, key=lambda m: -(m["input_token_limit"] or 0))
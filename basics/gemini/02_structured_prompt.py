@@ -5,15 +5,24 @@ import google.generativeai as genai
 from google.api_core import client_options as client_option_lib
 
 from dotenv import load_dotenv, find_dotenv
+
+from rate_limiter import RateLimitScheduler
+from response_cache import ResponseCache
+
 load_dotenv(find_dotenv())
 
 google_api_key  = os.getenv('GOOGLE_API_KEY')
 print(google_api_key)
 
 
-# helper fn for the API
-def generate_text(prompt, model, temperature=0.0):
-    return model.generate_content(prompt, generation_config={"temperature": temperature})
+response_cache = ResponseCache()
+# one quota for every call the script sends, thread pools included
+rate_limiter = RateLimitScheduler()
+
+# helper fn for the API - deterministic (temperature 0) calls are answered from the on-disk cache
+def generate_text(prompt, model, temperature=0.0, rate_limiter=rate_limiter):
+    return response_cache.generate(model, prompt, generation_config={"temperature": temperature},
+                                   rate_limiter=rate_limiter)
 
 
 def main():
@@ -6,9 +6,17 @@ from google.api_core import client_options as client_option_lib
 
 from dotenv import load_dotenv, find_dotenv
 
-# helper fn for the API
-def generate_text(prompt, model, temperature=0.0):
-    return model.generate_content(prompt, generation_config={"temperature": temperature})
+from rate_limiter import RateLimitScheduler
+from response_cache import ResponseCache
+
+response_cache = ResponseCache()
+# one quota for every call the script sends, thread pools included
+rate_limiter = RateLimitScheduler()
+
+# helper fn for the API - deterministic (temperature 0) calls are answered from the on-disk cache
+def generate_text(prompt, model, temperature=0.0, rate_limiter=rate_limiter):
+    return response_cache.generate(model, prompt, generation_config={"temperature": temperature},
+                                   rate_limiter=rate_limiter)
 
 
 def improve_code(model):
@@ -8,10 +8,23 @@ from google.api_core import client_options as client_option_lib
 
 from dotenv import load_dotenv, find_dotenv
 
+from manifest import Manifest
+from prompt_packing import PromptPacker
+from rate_limiter import RateLimitScheduler
+from repo_docs import RepoDocumenter
+from response_cache import ResponseCache
 
-# helper fn for the API
-def generate_text(prompt, model, temperature=0.0):
-    return model.generate_content(prompt, generation_config={"temperature": temperature})
+
+response_cache = ResponseCache()
+# one quota for every call the script sends, thread pools included
+rate_limiter = RateLimitScheduler()
+# what was sent last time: unchanged files (and functions) are not sent again
+manifest = Manifest()
+
+# helper fn for the API - deterministic (temperature 0) calls are answered from the on-disk cache
+def generate_text(prompt, model, temperature=0.0, rate_limiter=rate_limiter):
+    return response_cache.generate(model, prompt, generation_config={"temperature": temperature},
+                                   rate_limiter=rate_limiter)
 
 
 def explain_code(model):
@@ -23,13 +36,19 @@ def explain_code(model):
 ```
     Use a lot of detail and make it as clear as possible.
     """
+    merge_template = """
+    These are explanations of consecutive parts of one Python file:
+    {answers}
+    Merge them into one explanation of the whole file, keeping all the detail.
+    """
     path = "/home/ivana/projects/ABCA4-faf/classes/faf_analysis.py"
     with open(path, 'r') as file:
         question = file.read()
-    prompt = prompt_template.format(question=question)
-    print(prompt)
-    completion = generate_text(prompt, model)
-    print(completion.text)
+    # a file too large for the context window is explained class by class / function by function
+    packer = PromptPacker(generate_text, model, rate_limiter=rate_limiter)
+    print(manifest.analyze(path, question, prompt_template, model.model_name, granularity="file",
+                           ask=lambda code: packer.run(prompt_template, code, kind="python",
+                                                       merge_template=merge_template)))
 
 
 def document_code(model):
@@ -52,11 +71,17 @@ Use Google docstrings formatting
     path = "/home/ivana/projects/ABCA4-faf/classes/faf_analysis.py"
     with open(path, 'r') as file:
         question = file.read()
-    prompt = prompt_template.format(question=question)
-    print(prompt)
-    completion = generate_text(prompt, model)
-    print(completion.text)
+    # one prompt while the file fits; a re-run only sends the functions whose code changed, packed together
+    packer = PromptPacker(generate_text, model, rate_limiter=rate_limiter)
+    print(manifest.analyze(path, question, prompt_template, model.model_name,
+                           ask=lambda code: packer.run(prompt_template, code, kind="python"),
+                           budget=packer.budget(prompt_template)))
+    print("manifest:", manifest.stats)
+
 
+def document_repository(model, root, out_dir="docs_out"):
+    # every module of the tree, then a summary per package; unchanged files and functions are not sent again
+    RepoDocumenter(generate_text, model, manifest=manifest, rate_limiter=rate_limiter).run(root, out_dir)
 
 
 def main():
@@ -66,7 +91,7 @@ def main():
     google_api_key  = os.getenv('GOOGLE_API_KEY')
     print(google_api_key)
 
-     genai.configure(
+    genai.configure(
         api_key=google_api_key,
         transport="rest",
         client_options=client_option_lib.ClientOptions(api_endpoint=os.getenv("GOOGLE_API_BASE"))
@@ -74,6 +99,7 @@ def main():
     model_flash = genai.GenerativeModel(model_name='gemini-1.5-flash')
     # explain_code(model_flash)
     document_code(model_flash)
+    # document_repository(model_flash, "/home/ivana/projects/ABCA4-faf")
 
 if __name__ == "__main__":
     main()
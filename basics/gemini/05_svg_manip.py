@@ -9,10 +9,19 @@ from google.api_core import client_options as client_option_lib
 
 from dotenv import load_dotenv, find_dotenv
 
+from prompt_packing import PromptPacker
+from rate_limiter import RateLimitScheduler
+from response_cache import ResponseCache
 
-# helper fn for the API
-def generate_text(prompt, model, temperature=0.0):
-    return model.generate_content(prompt, generation_config={"temperature": temperature})
+
+response_cache = ResponseCache()
+# one quota for every call the script sends, thread pools included
+rate_limiter = RateLimitScheduler()
+
+# helper fn for the API - deterministic (temperature 0) calls are answered from the on-disk cache
+def generate_text(prompt, model, temperature=0.0, rate_limiter=rate_limiter):
+    return response_cache.generate(model, prompt, generation_config={"temperature": temperature},
+                                   rate_limiter=rate_limiter)
 
 
 def svg_manip(model):
@@ -45,14 +54,18 @@ def svg_manip(model):
 ```
     * Use xml.dom.minidom to format the xml output.
     
+    """
+    merge_template = """
+    These python scripts were each written for one part of the same svg file:
+    {answers}
+    Merge them into a single script doing all of the above for the whole file, following the same instructions.
     """
     path = "/home/ivana/scratch/fig4_ivana.svg"
     with open(path, 'r') as file:
         question = file.read()
-    prompt = prompt_template.format(question=question)
-
-    completion = generate_text(prompt, model)
-    print(completion.text)
+    # an svg too large for the context window is sent element by element
+    print(PromptPacker(generate_text, model, rate_limiter=rate_limiter).run(prompt_template, question, kind="svg",
+                                                 merge_template=merge_template))
 
 
 
@@ -0,0 +1,256 @@
+"""
+Incremental re-analysis: only send the code that changed since the last run.
+
+The Manifest (SQLite, next to the response cache) records for every analyzed
+file the hash of its content, of the prompt template and the model used, with
+the output; at "function" granularity also a hash and an output per top-level
+unit - each function or class, and each run of module-level statements
+between them ("<module>" before the first definition, "<module after f>" after
+f). A unit's hash is taken over its AST (ast.dump), so reformatting or editing
+comments does not count as a change. A function or class is sent with the
+module's imports and top-level assignments in front of it as context (marked
+as such; see unit_code); its hash does not cover them, so a new import alone
+does not get every function documented again.
+
+On a re-run an unchanged file is answered from the manifest outright; in a
+changed one only the units whose AST differs (or that are new) are sent, the
+others reuse their stored output, and the file's output is put back together
+in file order. A new template or model starts from scratch.
+
+What has to be sent goes in as few prompts as fit the window (`budget`):
+consecutive units are packed together, each behind a "# === unit <name> ==="
+line, and the model is asked to start each part of its answer with the same
+line, so the answer can be split back per unit. A whole file that fits is one
+prompt on the first run, too. A batch whose answer cannot be split is kept
+whole, and its units are sent again next time.
+"""
+import ast
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from prompt_packing import count_tokens
+
+DEFAULT_PATH = os.getenv("MANIFEST_PATH", str(Path.home() / ".cache" / "llms" / "manifest.sqlite"))
+MODULE_UNIT = "<module>"
+MAX_CONTEXT_LINES = 40
+UNIT_MARKER = "# === unit {} ==="
+UNIT_MARKER_RE = re.compile(r"^.*=== unit (.+?) ===.*$", re.M)
+BATCH_NOTE = ("# {} parts follow, each starting with a \"# === unit <name> ===\" line. Answer part by part,\n"
+              "# starting the answer to each part with that same line.\n")
+
+Unit = namedtuple("Unit", "name digest source context", defaults=("",))
+
+
+class Plan:
+
+    __slots__ = ("path", "model", "template_hash", "content_hash", "units", "reused", "todo", "output")
+
+    def __init__(self, path, model, template_hash, content_hash):
+        self.path = path
+        self.model = model
+        self.template_hash = template_hash
+        self.content_hash = content_hash
+        self.units = []
+        self.reused = {}  # unit name -> stored output
+        self.todo = []  # units to send
+        self.output = None  # the whole stored output, when nothing changed
+
+
+def digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def python_units(source):
+    """Top-level functions and classes, and the module-level statements between them, in file order."""
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return [Unit(MODULE_UNIT, digest(source), source)]
+    lines = source.splitlines(keepends=True)
+    definitions = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+    context = "".join("".join(lines[node.lineno - 1:node.end_lineno]) for node in tree.body
+                      if isinstance(node, (ast.Import, ast.ImportFrom, ast.Assign, ast.AnnAssign)))
+    context = "".join(context.splitlines(keepends=True)[:MAX_CONTEXT_LINES])
+    units, run_source, run_dump, run_name, seen = [], [], [], MODULE_UNIT, {}
+
+    def close_run():
+        if run_source:
+            units.append(Unit(run_name, digest("\n".join(run_dump)), "".join(run_source)))
+            run_source.clear()
+            run_dump.clear()
+
+    for node in tree.body:
+        first = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])]) - 1
+        segment = "".join(lines[first:node.end_lineno])
+        if isinstance(node, definitions):
+            close_run()
+            # a redefined name gets a counter, so both definitions keep their own output
+            seen[node.name] = seen.get(node.name, 0) + 1
+            name = node.name if seen[node.name] == 1 else f"{node.name}#{seen[node.name]}"
+            units.append(Unit(name, digest(ast.dump(node)), segment, context))
+            # named after the definition it follows, so adding a function elsewhere does not rename it
+            run_name = f"<module after {name}>"
+        else:
+            run_source.append(segment)
+            run_dump.append(ast.dump(node))
+    close_run()
+    return units
+
+
+def unit_code(unit):
+    """The code sent for a unit: a definition with the module's imports and assignments above it."""
+    if not unit.context:
+        return unit.source
+    return f"# module context, for reference only:\n{unit.context}# ----\n{unit.source}"
+
+
+def batches(units, budget=None):
+    """Units packed into prompts: [(unit names, code)], as few as fit `budget` tokens (one per unit without)."""
+    groups, current, size = [], [], 0
+    for unit in units:
+        tokens = count_tokens(unit.source) + 8  # + its marker line
+        if current and (budget is None or size + tokens > budget):
+            groups.append(current)
+            current, size = [], 0
+        if not current:
+            size = count_tokens(BATCH_NOTE + unit.context)
+        current.append(unit)
+        size += tokens
+    if current:
+        groups.append(current)
+    return [([unit.name for unit in group], batch_code(group)) for group in groups]
+
+
+def batch_code(group):
+    if len(group) == 1:
+        return unit_code(group[0])
+    # one context header for the batch, not one per unit
+    context = next((unit.context for unit in group if unit.context), "")
+    code = BATCH_NOTE.format(len(group))
+    if context:
+        code += f"# module context, for reference only:\n{context}# ----\n"
+    return code + "".join(f"{UNIT_MARKER.format(unit.name)}\n{unit.source}" for unit in group)
+
+
+def split_answer(names, answer):
+    """{name: part of the answer} for a batch, or None if the answer does not carry every unit's marker line."""
+    if len(names) == 1:
+        return {names[0]: answer}
+    marks = [(m.group(1), m.start(), m.end()) for m in UNIT_MARKER_RE.finditer(answer)]
+    parts = {}
+    for (name, _, end), following in zip(marks, marks[1:] + [(None, len(answer), None)]):
+        if name in names and name not in parts:
+            parts[name] = answer[end:following[1]].strip()
+    return parts if set(parts) == set(names) else None
+
+
+def collect(groups, answers):
+    """(outputs, unsplit) for Manifest.save from the answers to batches()."""
+    outputs, unsplit = {}, set()
+    for (names, _), answer in zip(groups, answers):
+        parts = split_answer(names, answer)
+        if parts is None:
+            # kept whole on the first unit of the batch, the others are sent again next time
+            parts = dict.fromkeys(names, "")
+            parts[names[0]] = answer
+            unsplit.update(names)
+        outputs.update(parts)
+    return outputs, unsplit
+
+
+class Manifest:
+
+    def __init__(self, path=DEFAULT_PATH):
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                path          TEXT NOT NULL,
+                model         TEXT NOT NULL,
+                template_hash TEXT NOT NULL,
+                content_hash  TEXT NOT NULL,
+                output        TEXT NOT NULL,
+                units         TEXT NOT NULL,
+                updated       REAL NOT NULL,
+                PRIMARY KEY (path, model, template_hash)
+            )""")
+        self.stats = {"files_reused": 0, "units_reused": 0, "units_sent": 0}
+
+    def plan(self, path, source, template, model_name, granularity="function"):
+        """What has to be sent for `path` now, and what can be taken from the last run."""
+        path = str(Path(path).resolve())
+        plan = Plan(path, model_name, digest(template), digest(source))
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash, output, units FROM files WHERE path = ? AND model = ? AND template_hash = ?",
+                (path, model_name, plan.template_hash)).fetchone()
+        if granularity == "file":
+            plan.units = [Unit(MODULE_UNIT, plan.content_hash, source)]
+        else:
+            plan.units = python_units(source)
+        if row and row[0] == plan.content_hash:
+            plan.output = row[1]
+            return plan
+        stored = json.loads(row[2]) if row else {}
+        for unit in plan.units:
+            previous = stored.get(unit.name)
+            if previous and previous[0] == unit.digest:
+                plan.reused[unit.name] = previous[1]
+            else:
+                plan.todo.append(unit)
+        return plan
+
+    def save(self, plan, outputs, unsplit=()):
+        """Record the outputs of plan.todo ({unit name: output}); returns the whole file's output.
+
+        Units in `unsplit` came back in a batch answer that could not be split:
+        stored without a digest, so the next run sends them again.
+        """
+        if plan.output is not None:
+            return plan.output
+        answers = {**plan.reused, **outputs}
+        output = "\n\n".join(answers[unit.name] for unit in plan.units if answers[unit.name])
+        units = {unit.name: ("" if unit.name in unsplit else unit.digest, answers[unit.name]) for unit in plan.units}
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                               (plan.path, plan.model, plan.template_hash, plan.content_hash, output,
+                                json.dumps(units), time.time()))
+        return output
+
+    def count(self, plan):
+        with self._lock:
+            if plan.output is not None:
+                self.stats["files_reused"] += 1
+            self.stats["units_reused"] += len(plan.reused)
+            self.stats["units_sent"] += len(plan.todo)
+
+    def analyze(self, path, source, template, model_name, ask, granularity="function", max_workers=4, budget=None):
+        """The output for `path`, with ask(code) -> text called only for the code that changed.
+
+        With a token `budget` (e.g. PromptPacker.budget(template)) the changed
+        units are packed into as few calls as fit; without, one call per unit.
+        """
+        plan = self.plan(path, source, template, model_name, granularity)
+        self.count(plan)
+        if plan.output is not None:
+            return plan.output
+        groups = batches(plan.todo, budget)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            answers = list(pool.map(lambda group: ask(group[1]), groups))
+        return self.save(plan, *collect(groups, answers))
+
+    def forget(self, path):
+        with self._lock:
+            self._conn.execute("DELETE FROM files WHERE path = ?", (str(Path(path).resolve()),))
+
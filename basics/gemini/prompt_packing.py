@@ -0,0 +1,239 @@
+"""
+Fit a source file into the model's context window before sending it.
+
+explain_code / document_code / svg_manip paste a whole file into one prompt.
+PromptPacker counts tokens locally (~4 characters per token, no API call),
+checks the prompt against the model's input_token_limit - taken from the model
+index model_catalog.py keeps under ~/.cache/llms, else asked once per process
+via genai.get_model - and when it does not fit, splits the input along its own
+structure: top-level statements / functions / classes (a class too large on
+its own goes method by method) for Python, child elements for SVG/XML (an
+element too large on its own is opened up). The chunks are sent side by side
+on a thread pool and the answers merged, either concatenated in order or by
+one more call with a merge prompt.
+"""
+import ast
+import functools
+import json
+import os
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from pathlib import Path
+
+MODEL_CATALOG_PATH = os.getenv("MODEL_CATALOG_PATH", str(Path.home() / ".cache" / "llms" / "models.json"))
+DEFAULT_INPUT_LIMIT = 32_768
+
+
+def count_tokens(text):
+    return len(text) // 4 + 1
+
+
+@functools.lru_cache(maxsize=None)
+def input_token_limit(model_name):
+    """input_token_limit of a Gemini model: from the cached model index, else from the API, else a safe default."""
+    name = model_name.removeprefix("models/")
+    try:
+        with open(MODEL_CATALOG_PATH) as infile:
+            for model in json.load(infile)["models"]:
+                if model["provider"] == "gemini" and model["name"] == name and model["input_token_limit"]:
+                    return model["input_token_limit"]
+    except (OSError, ValueError, KeyError):
+        pass
+    try:
+        import google.generativeai as genai
+        return genai.get_model(f"models/{name}").input_token_limit
+    except Exception as e:
+        print(f"no token limit for {name} ({e}), assuming {DEFAULT_INPUT_LIMIT}")
+        return DEFAULT_INPUT_LIMIT
+
+
+# ---------------------------------------------------------------- splitting
+
+def python_units(source, budget):
+    """Source segments of top-level statements, whole functions/classes where they fit in `budget` tokens."""
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return line_units(source, budget)
+    lines = source.splitlines(keepends=True)
+    units, start = [], 0
+    for node in tree.body:
+        first = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])]) - 1
+        if first > start:
+            units.append("".join(lines[start:first]))  # comments and blank lines between nodes
+        segment = "".join(lines[first:node.end_lineno])
+        if count_tokens(segment) <= budget:
+            units.append(segment)
+        elif isinstance(node, ast.ClassDef):
+            units.extend(class_units(node, lines, first, budget))
+        else:
+            units.extend(definition_units(segment, budget, signature=signature(node, lines, first)))
+        start = node.end_lineno
+    if start < len(lines):
+        units.append("".join(lines[start:]))
+    return units
+
+
+def class_units(node, lines, first, budget):
+    # every part repeats the class line, so each chunk still says which class the methods belong to
+    # the body starts at the first member's decorators, if any - they belong to that member, not the header
+    first_member = node.body[0]
+    body_start = min([first_member.lineno] + [d.lineno for d in getattr(first_member, "decorator_list", [])]) - 1
+    header = "".join(lines[first:body_start])
+    units, start = [], body_start
+    for child in node.body:
+        segment = "".join(lines[start:child.end_lineno])  # with the comments and decorators above it
+        if count_tokens(header + segment) <= budget:
+            units.append(header + segment)
+        else:
+            child_first = min([child.lineno] + [d.lineno for d in getattr(child, "decorator_list", [])]) - 1
+            units.extend(definition_units(segment, budget, header, signature(child, lines, child_first)))
+        start = child.end_lineno
+    return units
+
+
+def signature(node, lines, first):
+    # decorators and def line(s) of a function, up to its body; nothing for other statements
+    if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        return ""
+    return "".join(lines[first:max(node.body[0].lineno - 1, node.lineno)])
+
+
+def definition_units(text, budget, header="", signature=""):
+    """Line-split pieces of a definition too large for one prompt, each starting with `header`.
+
+    Every piece after the first also repeats the function's `signature`, so a
+    piece from the middle of a method still says which class and method it is.
+    """
+    repeat = header + (signature + "# ... continued\n" if signature else "")
+    pieces = line_units(text, budget - count_tokens(repeat))
+    return [(header if n == 0 else repeat) + piece for n, piece in enumerate(pieces)]
+
+
+def line_units(text, budget):
+    units, current = [], []
+    size = 0
+    for line in text.splitlines(keepends=True):
+        tokens = count_tokens(line)
+        if current and size + tokens > budget:
+            units.append("".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += tokens
+    if current:
+        units.append("".join(current))
+    return units
+
+
+def register_namespaces(text):
+    # keep the document's own prefixes (svg, inkscape, sodipodi, ...) instead of ns0/ns1
+    for _, (prefix, uri) in ET.iterparse(StringIO(text), events=("start-ns",)):
+        ET.register_namespace(prefix, uri)
+
+
+def xml_units(text, budget):
+    """Serialized pieces of the document, each a copy of the root holding some of its children."""
+    try:
+        register_namespaces(text)
+        root = ET.fromstring(text)
+    except ET.ParseError:
+        return line_units(text, budget)
+    return [ET.tostring(part, encoding="unicode") for part in split_element(root, budget)]
+
+
+def split_element(element, budget):
+    shell = ET.Element(element.tag, element.attrib)
+    shell.text = element.text
+    overhead = count_tokens(ET.tostring(shell, encoding="unicode"))
+    parts, current, size = [], [], overhead
+    for child in element:
+        tokens = count_tokens(ET.tostring(child, encoding="unicode"))
+        if tokens + overhead > budget and len(child):
+            # too large on its own: open it up, each piece wrapped in this element again
+            for piece in split_element(child, budget - overhead):
+                parts.append(wrap(shell, [piece]))
+            continue
+        if current and size + tokens > budget:
+            parts.append(wrap(shell, current))
+            current, size = [], overhead
+        current.append(child)
+        size += tokens
+    if current or not parts:
+        parts.append(wrap(shell, current))
+    return parts
+
+
+def wrap(shell, children):
+    copy = ET.Element(shell.tag, shell.attrib)
+    copy.text = shell.text
+    copy.extend(children)
+    return copy
+
+
+SPLITTERS = {"python": python_units, "xml": xml_units, "svg": xml_units, "text": line_units}
+
+
+def pack(units, budget):
+    """Consecutive units joined into as few chunks of at most `budget` tokens as possible."""
+    chunks, current, size = [], [], 0
+    for unit in units:
+        tokens = count_tokens(unit)
+        if current and size + tokens > budget:
+            chunks.append("".join(current))
+            current, size = [], 0
+        current.append(unit)
+        size += tokens
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+
+# ---------------------------------------------------------------- running
+
+class PromptPacker:
+
+    def __init__(self, generate, model, max_workers=4, output_reserve=8192, safety=0.8, input_limit=None,
+                 rate_limiter=None):
+        # generate: (prompt, model) -> response with .text, e.g. the scripts' generate_text;
+        # with a shared rate_limiter.RateLimitScheduler it is passed on as generate(..., rate_limiter=)
+        self.generate = generate
+        self.model = model
+        self.rate_limiter = rate_limiter
+        self.max_workers = max_workers
+        self.output_reserve = output_reserve
+        self.input_limit = input_limit or input_token_limit(model.model_name)
+        # the 4-characters rule is rough: leave headroom
+        self.window = int(self.input_limit * safety) - output_reserve
+
+    def budget(self, template):
+        return self.window - count_tokens(template.format(question=""))
+
+    def chunks(self, template, text, kind="text"):
+        budget = self.budget(template)
+        if count_tokens(text) <= budget:
+            return [text]
+        # XML pieces are complete documents each; everything else is packed back together
+        units = SPLITTERS[kind](text, budget)
+        return units if kind in ("xml", "svg") else pack(units, budget)
+
+    def run(self, template, text, kind="text", merge_template=None):
+        """The answer to template.format(question=text), asked in as many pieces as the window needs."""
+        chunks = self.chunks(template, text, kind)
+        if len(chunks) == 1:
+            return self.ask(template.format(question=text))
+        print(f"{count_tokens(text)} tokens do not fit into {self.window}: asking in {len(chunks)} parts")
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            answers = list(pool.map(lambda chunk: self.ask(template.format(question=chunk)), chunks))
+        return self.merge(answers, merge_template)
+
+    def merge(self, answers, merge_template=None):
+        joined = "\n\n".join(f"<!-- part {n} of {len(answers)} -->\n{answer}" for n, answer in enumerate(answers, 1))
+        if merge_template is None or count_tokens(merge_template.format(answers=joined)) > self.window:
+            return "\n\n".join(answers)
+        return self.ask(merge_template.format(answers=joined))
+
+    def ask(self, prompt):
+        if self.rate_limiter:
+            return self.generate(prompt, self.model, rate_limiter=self.rate_limiter).text
+        return self.generate(prompt, self.model).text
@@ -0,0 +1,112 @@
+"""
+Client-side rate limiting for generate_content calls.
+
+The free tier (https://ai.google.dev/gemini-api/docs/rate-limits#free-tier)
+caps every model at some requests per minute and tokens per minute. The
+scripts here send many prompts from thread pools (PromptPacker, RepoDocumenter,
+Manifest.analyze); without a limit those bursts end in 429s. Every call first
+acquires from two token buckets of its model - one request, and an estimate of
+its tokens - with callers served first come, first served, and the estimate is
+settled against the reported usage once the response is back.
+
+One RateLimitScheduler is shared by everything a script sends; ResponseCache
+applies it to cache misses only, so answers from the cache never wait.
+"""
+import threading
+import time
+from collections import deque
+
+# (requests per minute, tokens per minute), free tier
+DEFAULT_QUOTAS = {
+    "gemini-1.5-flash": (15, 1_000_000),
+    "gemini-1.5-flash-8b": (15, 1_000_000),
+    "gemini-1.5-pro": (2, 32_000),
+    "gemini-2.0-flash": (15, 1_000_000),
+    "gemini-2.5-flash": (10, 250_000),
+    "gemini-2.5-pro": (5, 250_000),
+}
+FALLBACK_QUOTA = (10, 250_000)
+
+
+def estimate_tokens(prompt, output_allowance=1024):
+    # ~4 characters per token, plus room for the answer
+    return len(prompt if isinstance(prompt, str) else str(prompt)) // 4 + 1 + output_allowance
+
+
+class TokenBucket:
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self, amount):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        amount = min(amount, self.capacity)  # a huge prompt waits for a full bucket, not forever
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount):
+        # negative amounts charge tokens used beyond the estimate
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimitScheduler:
+
+    def __init__(self, quotas=None, fallback=FALLBACK_QUOTA):
+        self.quotas = dict(DEFAULT_QUOTAS, **(quotas or {}))
+        self.fallback = fallback
+        self._models = {}  # model -> (requests bucket, tokens bucket, queue of waiting tickets)
+        self._cond = threading.Condition()
+        self.waited = 0.0
+
+    def acquire(self, model_name, tokens):
+        """Block until the model has room for one more request of `tokens` tokens; FIFO among callers."""
+        started = time.monotonic()
+        ticket = object()
+        with self._cond:
+            requests, budget, queue = self._quota(model_name)
+            queue.append(ticket)
+            try:
+                while True:
+                    wait = None
+                    if queue[0] is ticket:
+                        wait = max(requests.wait_time(1), budget.wait_time(tokens))
+                        if wait == 0:
+                            break
+                    self._cond.wait(wait)
+            finally:
+                queue.remove(ticket)
+                self._cond.notify_all()
+            requests.take(1)
+            budget.take(tokens)
+            self.waited += time.monotonic() - started
+
+    def settle(self, model_name, estimated, actual):
+        """Correct the token bucket once the real usage of a call is known."""
+        if actual is None:
+            return
+        with self._cond:
+            self._quota(model_name)[1].give_back(estimated - actual)
+            self._cond.notify_all()
+
+    def generate_content(self, model, prompt, **kwargs):
+        """model.generate_content(prompt, ...) within the quota of model.model_name."""
+        estimated = estimate_tokens(prompt)
+        self.acquire(model.model_name, estimated)
+        response = model.generate_content(prompt, **kwargs)
+        usage = getattr(response, "usage_metadata", None)
+        self.settle(model.model_name, estimated, getattr(usage, "total_token_count", None))
+        return response
+
+    def _quota(self, model_name):
+        model_name = model_name.removeprefix("models/")
+        if model_name not in self._models:
+            rpm, tpm = self.quotas.get(model_name, self.fallback)
+            self._models[model_name] = (TokenBucket(rpm), TokenBucket(tpm), deque())
+        return self._models[model_name]
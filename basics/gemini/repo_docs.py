@@ -0,0 +1,177 @@
+"""
+Documentation for a whole source tree, map-reduce style.
+
+document_code handles one hard-coded file. RepoDocumenter walks a tree and
+
+1. map: documents every module - a module too large for one prompt goes in
+   function / class sized pieces (prompt_packing) - on a bounded thread pool,
+2. reduce: summarizes every package (directory) from the pages of its modules
+   and the summaries of its subpackages, deepest directories first.
+
+Calls go through the scripts' generate_text, i.e. through ResponseCache, whose
+key is a hash of the prompt - so a unit whose code (and template, and model)
+did not change since the last run is answered from disk, and a re-run over a
+500-file tree only pays for what changed. With a manifest.Manifest the modules
+are documented function by function, and unchanged files and functions are
+not even turned into prompts. A shared rate_limiter.RateLimitScheduler is
+handed to generate_text with every call, so the thread pools here cannot run
+past the model's quota. Pages are written as markdown under
+`out_dir`, mirroring the tree: one <module>.md per file, README.md per package.
+"""
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from manifest import batches, collect
+from prompt_packing import PromptPacker
+
+UNIT_TEMPLATE = """
+Please document this code from {path}:
+```python
+{question}
+```
+Describe what it is for in one paragraph, then every class and function: what it does,
+its arguments and what it returns. Output markdown.
+"""
+PACKAGE_TEMPLATE = """
+These are the documentation pages of the modules and subpackages of the package {path}:
+{question}
+Write a summary of the package in markdown: its purpose, its main modules and how they fit together.
+"""
+PACKAGE_MERGE_TEMPLATE = """
+These are summaries of parts of the package {path}:
+{answers}
+Merge them into one summary of the whole package.
+"""
+SKIP_DIRS = {".git", "__pycache__", ".venv", "venv", "node_modules", "build", "dist", ".tox", ".mypy_cache"}
+
+
+def with_path(template, path):
+    """The template with {path} filled in; it is .format()ted again later, so braces in the path are escaped."""
+    return template.replace("{path}", str(path).replace("{", "{{").replace("}", "}}"))
+
+
+def iter_sources(root, suffixes=(".py",)):
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories[:] = sorted(d for d in subdirectories if d not in SKIP_DIRS and not d.startswith("."))
+        for name in sorted(files):
+            if name.endswith(suffixes):
+                yield Path(directory) / name
+
+
+class RepoDocumenter:
+
+    def __init__(self, generate, model, max_workers=4, unit_template=UNIT_TEMPLATE,
+                 package_template=PACKAGE_TEMPLATE, manifest=None, rate_limiter=None):
+        # generate: (prompt, model) -> response with .text, e.g. the scripts' generate_text
+        self.generate = generate
+        self.model = model
+        self.max_workers = max_workers
+        self.unit_template = unit_template
+        self.package_template = package_template
+        self.packer = PromptPacker(self._generate, model, max_workers=max_workers, rate_limiter=rate_limiter)
+        self.manifest = manifest
+        self.stats = {"units": 0, "cached": 0}
+        self._lock = threading.Lock()
+
+    def _generate(self, prompt, model, **kwargs):
+        response = self.generate(prompt, model, **kwargs)
+        with self._lock:
+            self.stats["units"] += 1
+            self.stats["cached"] += getattr(response, "cached", False)
+        return response
+
+    def units(self, root, path):
+        """(key, code) pairs to send for one module: the whole file, or with a manifest the changed functions.
+
+        With a manifest a key is the tuple of unit names packed into that prompt.
+        """
+        template = with_path(self.unit_template, path.relative_to(root))
+        source = path.read_text(encoding="utf-8", errors="replace")
+        if not source.strip():
+            return template, None, []
+        if self.manifest is None:
+            return template, None, [(path, source)]
+        plan = self.manifest.plan(path, source, template, self.model.model_name)
+        self.manifest.count(plan)
+        return template, plan, [((path, tuple(names)), code)
+                                for names, code in batches(plan.todo, self.packer.budget(template))]
+
+    def document_modules(self, root, paths):
+        """{path: markdown} for every module, all prompts on one bounded pool."""
+        tasks, plans, keys = [], {}, {}
+        for path in paths:
+            template, plan, units = self.units(root, path)
+            plans[path] = plan
+            keys[path] = [key for key, _ in units]
+            for key, code in units:
+                # a unit too large for one prompt goes in pieces
+                tasks.extend((key, template, chunk) for chunk in self.packer.chunks(template, code, kind="python"))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            answers = pool.map(lambda task: self.packer.ask(task[1].format(question=task[2])), tasks)
+            parts = defaultdict(list)
+            for (key, _, _), answer in zip(tasks, answers):
+                parts[key].append(answer)
+        # the pieces of a split unit are in file order already
+        pages = {}
+        for path in paths:
+            plan = plans[path]
+            if plan is not None:
+                groups = [(list(names), None) for _, names in keys[path]]
+                answers = ["\n\n".join(parts[key]) for key in keys[path]]
+                pages[path] = self.manifest.save(plan, *collect(groups, answers))
+            elif parts[path]:
+                pages[path] = "\n\n".join(parts[path])
+        return pages
+
+    def summarize_packages(self, root, pages):
+        """{directory: markdown summary}, from the module pages and the summaries one level down."""
+        root = Path(root)
+        directories = {path.parent for path in pages}
+        for directory in list(directories):
+            while directory != root and root in directory.parents:
+                directory = directory.parent
+                directories.add(directory)
+        summaries = {}
+        # deepest first, so a package summary can build on its subpackages; one depth level at a time
+        for depth in sorted({len(d.parts) for d in directories}, reverse=True):
+            level = sorted(d for d in directories if len(d.parts) == depth)
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                for directory, summary in zip(level, pool.map(lambda d: self._summarize(root, d, pages, summaries),
+                                                                  level)):
+                    summaries[directory] = summary
+        return summaries
+
+    def _summarize(self, root, directory, pages, summaries):
+        sections = [f"## {path.name}\n{page}" for path, page in sorted(pages.items()) if path.parent == directory]
+        sections += [f"## {sub.name}/ (subpackage)\n{summary}" for sub, summary in sorted(summaries.items())
+                     if sub.parent == directory]
+        name = str(directory.relative_to(root)) if directory != root else root.name
+        return self.packer.run(with_path(self.package_template, name), "\n\n".join(sections),
+                               merge_template=with_path(PACKAGE_MERGE_TEMPLATE, name))
+
+    def run(self, root, out_dir=None):
+        """Document the tree under `root`; returns (module pages, package summaries), written to out_dir if given."""
+        root = Path(root).resolve()
+        pages = self.document_modules(root, list(iter_sources(root)))
+        summaries = self.summarize_packages(root, pages)
+        if out_dir:
+            write_pages(root, Path(out_dir), pages, summaries)
+        print(f"{len(pages)} modules, {len(summaries)} packages: "
+              f"{self.stats['units']} prompts, {self.stats['cached']} from cache")
+        if self.manifest:
+            print("manifest:", self.manifest.stats)
+        return pages, summaries
+
+
+def write_pages(root, out_dir, pages, summaries):
+    for path, page in pages.items():
+        target = out_dir / path.relative_to(root).with_suffix(".md")
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(page, encoding="utf-8")
+    for directory, summary in summaries.items():
+        target = out_dir / directory.relative_to(root) / "README.md"
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(summary, encoding="utf-8")
@@ -0,0 +1,114 @@
+"""
+On-disk cache for generate_text() responses.
+
+A response is keyed by sha256 over (model name, prompt, generation_config), so
+re-running a prompt sweep at temperature 0 costs no API calls. Entries live in
+a single SQLite file; old entries are dropped after `ttl` seconds, and the least
+recently used ones go first once the stored text exceeds `max_bytes`.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_PATH = os.getenv("LLM_CACHE_PATH", str(Path.home() / ".cache" / "llms" / "responses.sqlite"))
+
+
+class CachedResponse:
+    # quacks like the parts of GenerateContentResponse the scripts use
+    def __init__(self, text, cached=True):
+        self.text = text
+        self.cached = cached
+
+
+class ResponseCache:
+
+    def __init__(self, path=DEFAULT_PATH, ttl=30 * 24 * 3600, max_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key      TEXT PRIMARY KEY,
+                model    TEXT NOT NULL,
+                text     TEXT NOT NULL,
+                size     INTEGER NOT NULL,
+                created  REAL NOT NULL,
+                accessed REAL NOT NULL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+
+    @staticmethod
+    def key(model_name, prompt, generation_config=None):
+        payload = json.dumps([model_name, prompt, generation_config or {}], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT text, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return row[0]
+
+    def put(self, key, model_name, text):
+        now = time.time()
+        size = len(text.encode("utf-8"))
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                               (key, model_name, text, size, now, now))
+            self._evict(now)
+
+    def generate(self, model, prompt, generation_config=None, rate_limiter=None):
+        """Drop-in for model.generate_content(prompt, generation_config=...), served from cache when possible.
+
+        Only deterministic calls (temperature 0) are cached - anything else is
+        sampling on purpose and goes to the API every time. With a
+        rate_limiter.RateLimitScheduler the calls that do go to the API wait
+        for room in the model's quota; cache hits never do.
+        """
+        generation_config = generation_config or {}
+        send = rate_limiter.generate_content if rate_limiter else lambda m, p, **kw: m.generate_content(p, **kw)
+        if generation_config.get("temperature", 0.0) != 0.0:
+            return send(model, prompt, generation_config=generation_config)
+        key = self.key(model.model_name, prompt, generation_config)
+        text = self.get(key)
+        if text is not None:
+            return CachedResponse(text)
+        response = send(model, prompt, generation_config=generation_config)
+        self.put(key, model.model_name, response.text)
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # least recently used first, until we are back under budget
+        excess = total - self.max_bytes
+        freed = 0
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            doomed.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)